@@ -0,0 +1,573 @@
+import io
+import json
+import os
+import re
+import threading
+import warnings
+import zipfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ahp_engine import analyze_stack, analyze_task_panel, random_index
+from response_store import open_store, parse_raw_data
+from survey_store import CHUNK_ROWS, iter_responses_since
+
+# ==============================================================================
+# [설정] 분석 옵션 (결과 센터 사이드바와 동일)
+# ==============================================================================
+AnalysisOptions = namedtuple(
+    "AnalysisOptions",
+    ["auto_calibrate", "cr_threshold", "max_scale", "calibration", "method"],
+    defaults=[True, 0.1, 5.0, "search", "eigen"],
+)
+
+# ==============================================================================
+# [함수] 제출 시점 계산 (Metrics 열)
+# ==============================================================================
+METRICS_VERSION = 1  # 계산 방식이 바뀌면 올려서 이전에 저장된 결과를 무효화합니다.
+
+def metrics_tag(options):
+    """저장된 결과를 만든 계산 조건을 나타내는 문자열. 결과 센터의 옵션과 같을 때만 재사용합니다."""
+    return (f"v{METRICS_VERSION}|calib={int(bool(options.auto_calibrate))}|cr={float(options.cr_threshold):g}"
+            f"|scale={float(options.max_scale):g}|{options.calibration}|{options.method}")
+
+def compute_metrics(raw, options=AnalysisOptions()):
+    """
+    응답 하나(Raw_Data JSON)를 검증하고 과제별 가중치·λmax·CR·보정 여부를 계산합니다.
+    반환값: {"v": metrics_tag, "tasks": {과제명: {"items", "w", "lambda", "cr", "calibrated", "iters"}}}
+    비교값이 없거나 0/음수/숫자가 아니면 ValueError를 냅니다.
+    """
+    try:
+        parsed = parse_raw_data(raw)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"응답 형식을 해석할 수 없습니다: {e}") from e
+    if not parsed:
+        raise ValueError("비교 응답이 없습니다.")
+    tasks = {}
+    for t_name, (items, norm_comps) in parsed.items():
+        if len(items) < 2:
+            raise ValueError(f"[{t_name}] 비교 항목이 부족합니다.")
+        if not all(np.isfinite(v) and v > 0 for v in norm_comps.values()):
+            raise ValueError(f"[{t_name}] 비교값은 0보다 큰 숫자여야 합니다.")
+        w, cr, calib, iters = analyze_task_panel(
+            items, [norm_comps], do_calibration=options.auto_calibrate, cr_limit=options.cr_threshold,
+            max_scale=options.max_scale, calibration=options.calibration, method=options.method
+        )
+        n = len(items)
+        tasks[t_name] = {"items": list(items), "w": [float(x) for x in w[0]],
+                         "lambda": n + float(cr[0]) * random_index(n) * (n - 1), "cr": float(cr[0]),
+                         "calibrated": bool(calib[0]), "iters": int(iters[0])}
+    return {"v": metrics_tag(options), "tasks": tasks}
+
+def _precomputed_tasks(metrics, tag):
+    """Metrics 값(JSON 문자열 또는 dict)이 tag와 같은 조건으로 계산된 것이면 과제별 결과 dict를, 아니면 None."""
+    if isinstance(metrics, str):
+        try: metrics = json.loads(metrics)
+        except ValueError: return None
+    if not isinstance(metrics, dict) or metrics.get("v") != tag: return None
+    return metrics.get("tasks") or None
+
+def _task_record(t_name, t):
+    return (t_name, tuple(t["items"]), np.asarray(t["w"], dtype=float), float(t["cr"]), bool(t["calibrated"]), int(t["iters"]))
+
+# ==============================================================================
+# [함수] 응답자별 계산 (과제 단위 일괄 처리)
+# ==============================================================================
+def analyze_store(store, options, start=0, progress=None, stop=None, metas=None):
+    """
+    이진 저장소(response_store)의 [start, stop) 행을 분석합니다. JSON을 다시 해석하지 않고
+    메모리 매핑된 비교값 배열에서 과제별 행렬 묶음을 바로 만들어, 결과도 과제별 배열로 돌려줍니다.
+    반환값: {"n": 행 수, "included": 과제가 하나라도 있는 행, "precomputed": 제출 시점 결과가 있는 행,
+    "tasks": [(과제명, 저장소 항목 순서, 구간 안 행 번호, 가중치 (K, n), cr, 보정 여부, 반복 횟수, 비교 행렬 로그 (K, n, n))]}
+    가중치의 빠진 항목(제출 시점 결과에 없던 항목)은 nan이고, 로그는 집단 종합(AIJ)에 씁니다.
+    metas(해당 구간의 응답자 목록)를 넘기면 응답자 파일을 다시 읽지 않습니다.
+    """
+    stop = store.n_rows if stop is None else min(stop, store.n_rows)
+    n_rows = max(stop - start, 0)
+    chunk = {"n": n_rows, "included": np.zeros(n_rows, dtype=bool), "precomputed": np.zeros(n_rows, dtype=bool),
+             "tasks": []}
+    if not n_rows: return chunk
+    if metas is None: metas = store.respondents(start, stop)
+    tag = metrics_tag(options)
+    pre = [_precomputed_tasks(m.get("Metrics"), tag) for m in metas]
+    chunk["precomputed"][:] = [bool(p) for p in pre]
+    for t_idx, task in enumerate(store.tasks):
+        rows, stack = store.task_stack(t_idx, start, stop)
+        if not len(rows): continue
+        rows = rows - start
+        # 집단 종합(AIJ)용 원래 비교값의 로그. 빠진 비교쌍은 nan으로 남습니다.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(stack)
+        items, t_name = list(task["items"]), task["name"]
+        index = {item: i for i, item in enumerate(items)}
+        w = np.full((len(rows), len(items)), np.nan)
+        cr, calib, iters = np.zeros(len(rows)), np.zeros(len(rows), dtype=bool), np.zeros(len(rows), dtype=int)
+        # 제출 시점에 같은 조건으로 계산해 둔 행은 저장된 값을 저장소 항목 순서로 옮기고, 나머지만 일괄 계산합니다.
+        reuse = np.zeros(len(rows), dtype=bool)
+        for k, r in enumerate(rows):
+            found = pre[r] and pre[r].get(t_name)
+            pos = [index.get(item) for item in found["items"]] if found else [None]
+            if None in pos: continue
+            _, _, w_k, cr[k], calib[k], iters[k] = _task_record(t_name, found)
+            w[k, pos], reuse[k] = w_k, True
+        todo = np.flatnonzero(~reuse)
+        if len(todo):
+            w[todo], cr[todo], calib[todo], iters[todo] = analyze_stack(
+                stack[todo], do_calibration=options.auto_calibrate, cr_limit=options.cr_threshold,
+                max_scale=options.max_scale, calibration=options.calibration, method=options.method
+            )
+        chunk["included"][rows] = True
+        chunk["tasks"].append((t_name, items, rows, w, cr, calib, iters, logs))
+        if progress: progress((t_idx + 1) / len(store.tasks))
+    return chunk
+
+def iter_store_chunks(store, options, start=0, chunksize=CHUNK_ROWS):
+    """
+    저장소의 start번째 행부터 chunksize 행씩 분석해 (처리한 마지막 행 번호, analyze_store 결과)를 차례로 내보냅니다.
+    한 번에 한 청크의 행렬 묶음만 메모리에 올라갑니다.
+    """
+    metas = []
+    for meta in store.iter_respondents(start):
+        metas.append(meta)
+        if len(metas) == chunksize:
+            yield start + len(metas), analyze_store(store, options, start, stop=start + len(metas), metas=metas)
+            start, metas = start + len(metas), []
+    if metas:
+        yield start + len(metas), analyze_store(store, options, start, stop=start + len(metas), metas=metas)
+
+# ==============================================================================
+# [클래스] 과제별 집단 종합 (AIP / AIJ)
+# ==============================================================================
+AGGREGATIONS = ("aip", "aij")
+
+class GroupAggregate:
+    """
+    과제 하나의 집단 종합 상태. 응답 묶음이 들어올 때마다 항목별 가중치 합(AIP: 개별 우선순위 평균)과
+    비교값 로그 합·개수(AIJ: 판단 행렬의 원소별 기하평균)를 묶음 전체의 합으로 한 번에 갱신하고,
+    읽을 때만 종합 행렬의 가중치·CR을 한 번 계산(O(n³))합니다. 응답 수와 무관하게 상태 크기는 n×n입니다.
+    """
+
+    def __init__(self):
+        self.items = []
+        self._index = {}
+        self.w_sum, self.w_n = np.zeros(0), np.zeros(0, dtype=int)
+        self.log_sum, self.log_n = np.zeros((0, 0)), np.zeros((0, 0), dtype=int)
+
+    def _positions(self, items):
+        """항목 이름 → 상태 배열 위치. 처음 보는 항목이면 배열을 늘립니다 (기존 합계는 그대로)."""
+        grow = len(self.items)
+        for item in items:
+            if item not in self._index:
+                self._index[item] = len(self.items); self.items.append(item)
+        grow = len(self.items) - grow
+        if grow:
+            self.w_sum, self.w_n = np.pad(self.w_sum, (0, grow)), np.pad(self.w_n, (0, grow))
+            self.log_sum, self.log_n = np.pad(self.log_sum, (0, grow)), np.pad(self.log_n, (0, grow))
+        return np.array([self._index[item] for item in items], dtype=int)
+
+    def add(self, items, weights):
+        """응답 묶음의 가중치 (K, n)를 더합니다 (AIP). nan인 항목은 개수에서도 빠집니다."""
+        pos = self._positions(items)
+        known = np.isfinite(weights)
+        self.w_sum[pos] += np.where(known, weights, 0.0).sum(axis=0)
+        self.w_n[pos] += known.sum(axis=0)
+
+    def add_judgments(self, items, log_matrices):
+        """응답 묶음의 원래 비교 행렬 로그 (K, n, n)를 더합니다 (AIJ). 빠진 비교쌍(nan)은 개수에서도 빠집니다."""
+        pos = self._positions(items)
+        known = np.isfinite(log_matrices)
+        cells = np.ix_(pos, pos)
+        self.log_sum[cells] += np.where(known, log_matrices, 0.0).sum(axis=0)
+        self.log_n[cells] += known.sum(axis=0)
+
+    def aip(self):
+        """{항목: 개별 가중치의 평균}."""
+        return {item: self.w_sum[i] / self.w_n[i] for i, item in enumerate(self.items) if self.w_n[i]}
+
+    def aij(self, method="eigen"):
+        """
+        판단 기하평균 행렬의 ({항목: 가중치}, CR). 아무도 답하지 않은 비교쌍은 불완전 행렬로 채웁니다 (analyze_stack).
+        비교 자료가 없으면 None.
+        """
+        n = len(self.items)
+        if n < 2 or not self.log_n.any(): return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix = np.where(self.log_n > 0, np.exp(self.log_sum / np.maximum(self.log_n, 1)), np.nan)
+        matrix[np.arange(n), np.arange(n)] = 1.0
+        w, cr, _, _ = analyze_stack(matrix[None], method=method)
+        return dict(zip(self.items, (float(x) for x in w[0]))), float(cr[0])
+
+# ==============================================================================
+# [클래스] 결과 센터 화면용 누적 집계
+# ==============================================================================
+class RunningSummary:
+    """
+    analyze_store의 청크 결과를 받아 유효 판정, 과제별 집단 종합(GroupAggregate), 과제별 평균 CR, 보정 통계를
+    과제별 배열 연산으로 합계·개수만 누적합니다. 응답자별 목록을 보관하지 않으므로 메모리 사용량이 응답 수와 무관합니다.
+    keep_panel=True일 때만 부트스트랩용 유효 응답자 가중치 배열(응답 수에 비례)을 함께 모읍니다.
+    """
+
+    def __init__(self, cr_threshold, method="eigen", keep_panel=False):
+        self.cr_threshold = cr_threshold
+        self.method = method
+        self.keep_panel = keep_panel
+        self.n_total = 0
+        self.n_valid = 0
+        self.calibrated_count = 0
+        self.precomputed_count = 0
+        self.groups = {}        # 과제명 → GroupAggregate (유효 응답자만, 처음 나온 순서 유지)
+        self.panel_keys = []    # 부트스트랩용 유효 응답자 × (과제, 항목) 가중치 배열의 열
+        self._panel_index = {}
+        self._panel_blocks = []
+        self.cr_sums = {}       # 과제명 → [합계, 개수]
+        self.calib_count = 0
+        self.calib_iter_sum = 0
+        self.calib_iter_max = 0
+
+    def add(self, chunk):
+        """
+        청크 하나를 더합니다. 응답자는 과제를 저장소 순서로 보며 CR 기준을 넘는 과제가 나오면 무효가 되고,
+        그 전까지의 과제 CR은 평균에 들어갑니다 (기존 응답자별 판정과 같은 규칙).
+        """
+        included = chunk["included"]
+        self.n_total += int(included.sum())
+        self.precomputed_count += int((chunk["precomputed"] & included).sum())
+        alive = np.ones(chunk["n"], dtype=bool)
+        calibrated = np.zeros(chunk["n"], dtype=bool)
+        for t_name, _, rows, _, cr, calib, iters, _ in chunk["tasks"]:
+            alive[rows[cr > self.cr_threshold]] = False
+            ok = alive[rows]
+            if ok.any():
+                acc = self.cr_sums.setdefault(t_name, [0.0, 0])
+                acc[0] += float(cr[ok].sum()); acc[1] += int(ok.sum())
+            if calib.any():
+                self.calib_count += int(calib.sum())
+                self.calib_iter_sum += int(iters[calib].sum())
+                self.calib_iter_max = max(self.calib_iter_max, int(iters[calib].max()))
+                calibrated[rows[calib]] = True
+
+        valid = alive & included
+        self.n_valid += int(valid.sum())
+        self.calibrated_count += int((valid & calibrated).sum())
+        panel_row = np.cumsum(valid) - 1
+        block = None
+        for t_name, items, rows, w, _, _, _, logs in chunk["tasks"]:
+            sel = valid[rows]
+            if not sel.any(): continue
+            group = self.groups.get(t_name)
+            if group is None: group = self.groups[t_name] = GroupAggregate()
+            group.add(items, w[sel])
+            group.add_judgments(items, logs[sel])
+            if self.keep_panel:
+                cols = [self._panel_column((t_name, item)) for item in items]
+                if block is None or block.shape[1] < len(self.panel_keys):
+                    width = len(self.panel_keys)
+                    block = np.full((int(valid.sum()), width), np.nan) if block is None else \
+                        np.pad(block, ((0, 0), (0, width - block.shape[1])), constant_values=np.nan)
+                block[np.ix_(panel_row[rows[sel]], cols)] = w[sel]
+        if block is not None: self._panel_blocks.append(block)
+        return self
+
+    def _panel_column(self, key):
+        if key not in self._panel_index:
+            self._panel_index[key] = len(self.panel_keys); self.panel_keys.append(key)
+        return self._panel_index[key]
+
+    def panel(self):
+        """유효 응답자 × (과제, 항목) 가중치 배열 (응답하지 않은 항목은 nan). 부트스트랩 재표본에 씁니다."""
+        width = len(self.panel_keys)
+        if not self._panel_blocks: return np.zeros((0, width))
+        if len(self._panel_blocks) > 1 or self._panel_blocks[0].shape[1] != width:
+            self._panel_blocks = [np.vstack([np.pad(b, ((0, 0), (0, width - b.shape[1])), constant_values=np.nan)
+                                             for b in self._panel_blocks])]
+        return self._panel_blocks[0]
+
+    def result(self):
+        """
+        결과 센터 화면용 집계 dict. task_weights는 유효 응답자의 개별 가중치 평균(AIP) {과제: {항목: 평균}},
+        avg_weights는 같은 값의 pandas Series("과제|항목" 색인)입니다.
+        aij는 {과제: {"weights": {항목: 가중치}, "cr": 종합 행렬 CR}} (판단 기하평균, 원래 응답 기준)이고,
+        panel은 부트스트랩용 유효 응답자 가중치 배열이며 keep_panel=False면 None입니다
+        (응답자당 항목 수만큼의 float, 집계 중 유일하게 응답 수에 비례).
+        """
+        task_weights = {t_name: g.aip() for t_name, g in self.groups.items()}
+        aij = {}
+        for t_name, g in self.groups.items():
+            found = g.aij(self.method)
+            if found: aij[t_name] = {"weights": found[0], "cr": found[1]}
+        return {
+            "n_total": self.n_total, "n_valid": self.n_valid, "task_weights": task_weights, "aij": aij,
+            "panel": {"keys": list(self.panel_keys), "weights": self.panel()} if self.keep_panel else None,
+            "avg_weights": pd.Series({f"{t}|{i}": w for t, ws in task_weights.items() for i, w in ws.items()}, dtype=float),
+            "task_cr": {t: s / n for t, (s, n) in self.cr_sums.items()},
+            "calibrated_count": self.calibrated_count, "precomputed_count": self.precomputed_count,
+            "calib_count": self.calib_count, "calib_iter_max": self.calib_iter_max,
+            "calib_iter_mean": self.calib_iter_sum / self.calib_count if self.calib_count else 0.0,
+        }
+
+def summarize_file(file_path, options, chunksize=CHUNK_ROWS, progress=None, panel=False):
+    """
+    캐시 없이 파일 하나를 처음부터 청크 단위로 분석해 집계 dict를 돌려줍니다 (일괄 리포트용).
+    panel=True면 bootstrap_report에 필요한 응답자 가중치 배열도 모읍니다.
+    """
+    store = open_store(file_path)
+    running = RunningSummary(options.cr_threshold, options.method, keep_panel=panel)
+    for stop, chunk in iter_store_chunks(store, options, 0, chunksize):
+        running.add(chunk)
+        if progress: progress(stop / max(store.n_rows, 1))
+    return running.result()
+
+# ==============================================================================
+# [함수] 최종 리포트 (결과 센터 화면·엑셀, batch_report 공용)
+# ==============================================================================
+def is_match(main_name, sub_task_name):
+    clean_main = main_name.replace(" ", "").strip()
+    clean_sub = sub_task_name.replace(" ", "").strip()
+    if clean_main in clean_sub: return True
+    match = re.search(r'\[(.*?)\]', sub_task_name)
+    if match:
+        extracted = match.group(1).replace(" ", "").strip()
+        if extracted == clean_main: return True
+    return False
+
+def build_report(summary, schema=None, aggregation="aip"):
+    """
+    집계 dict에서 대항목·소항목·종합 가중치 리포트를 만듭니다. 반환값: (리포트 DataFrame, 1단계 CR)
+    aggregation이 "aip"면 개별 가중치 평균과 응답자 CR 평균을, "aij"면 판단 기하평균 행렬의 가중치와 그 행렬의 CR을 씁니다.
+    schema(survey_schema.SurveySchema)가 있으면 설정의 계층으로 대항목과 세부 과제를 바로 연결하고,
+    없거나 과제 이름이 다르면(설정 없는 레거시 파일) 이름 매칭(is_match)으로 찾습니다. 과제가 없으면 (None, 0.0).
+    report_df.attrs["keys"]에는 행별 ((대항목 과제, 항목) 또는 None, (세부 과제, 항목) 또는 None)을 둡니다 (부트스트랩용).
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"알 수 없는 집단 종합 방식: {aggregation}")
+    if aggregation == "aij":
+        task_weights = {t: g["weights"] for t, g in summary["aij"].items()}
+        task_cr = {t: g["cr"] for t, g in summary["aij"].items()}
+    else:
+        task_weights = summary["task_weights"]
+        task_cr = summary["task_cr"]
+    if not task_weights: return None, 0.0
+    def get_avg_cr(task_name): return task_cr.get(task_name, 0.0)
+
+    if schema is not None and schema.main_task in task_weights:
+        main_task = schema.main_task
+    elif schema is not None and schema.main_task is None and len(schema.main_criteria) == 1:
+        main_task = None  # 기준이 하나뿐이면 1단계 비교 없이 가중치 1
+    else:
+        main_task = sorted(task_weights)[0]
+    sub_tasks = sorted(t for t in task_weights if t != main_task)
+    final_rows, keys = [], []
+
+    main_cr = get_avg_cr(main_task)
+    if main_task is None:
+        main_items = [{"name": schema.main_criteria[0], "w": 1.0}]
+    else:
+        main_items = [{"name": k, "w": w} for k, w in task_weights[main_task].items()]
+    main_items.sort(key=lambda x: x['w'], reverse=True)
+
+    for m in main_items:
+        match_sub = schema.sub_tasks.get(m['name']) if schema is not None else None
+        if match_sub not in task_weights:
+            match_sub = next((s for s in sub_tasks if is_match(m['name'], s)), None)
+        if match_sub:
+            sub_cr = get_avg_cr(match_sub)
+            subs = [{"n": k, "w": w} for k, w in task_weights[match_sub].items()]
+            subs.sort(key=lambda x: (m['w'] * x['w']), reverse=True)
+            for i, s in enumerate(subs):
+                keys.append((main_task and (main_task, m['name']), (match_sub, s['n'])))
+                final_rows.append({
+                    "대항목명": m['name'] if i == 0 else "", "대항목 가중치": m['w'] if i == 0 else None,
+                    "소항목명": s['n'], "소항목 가중치": s['w'], "종합 가중치": m['w'] * s['w'],
+                    "그룹 CR": sub_cr, "순위": 0
+                })
+        else:
+            keys.append((main_task and (main_task, m['name']), None))
+            final_rows.append({
+                "대항목명": m['name'], "대항목 가중치": m['w'], "소항목명": "-",
+                "소항목 가중치": None, "종합 가중치": m['w'], "그룹 CR": main_cr, "순위": 0
+            })
+
+    report_df = pd.DataFrame(final_rows)
+    report_df['순위'] = report_df['종합 가중치'].rank(ascending=False, method='min').astype(int)
+    report_df.attrs["keys"] = keys
+    return report_df, main_cr
+
+def report_labels(report_df):
+    """리포트 행별 "대항목 > 소항목" 이름 (소항목이 없으면 대항목명). 비어 있는 대항목명 칸은 위 행을 따릅니다."""
+    mains = report_df["대항목명"].where(report_df["대항목명"] != "").ffill()
+    return [m if s == "-" else f"{m} > {s}" for m, s in zip(mains, report_df["소항목명"])]
+
+def bootstrap_report(report_df, summary, n_boot=1000, level=0.95, seed=0, batch=250):
+    """
+    유효 응답자 가중치 배열(summary["panel"], panel=True로 집계해야 있음)에서 응답자를 복원 추출한 패널을 n_boot번 만들어,
+    리포트 각 행의 대항목·소항목·종합 가중치 백분위 구간과 순위 확률을 구합니다 (AIP 기준).
+    재표본은 응답자별 선택 횟수 행렬(bincount)과 가중치 배열의 행렬 곱으로 batch개씩 한꺼번에 계산하며,
+    seed가 같으면 결과도 같습니다. 반환값: (구간 DataFrame, 순위 확률 DataFrame) — 행 순서는 report_df와 같고,
+    유효 응답자가 없으면 (None, None).
+    """
+    if summary.get("panel") is None:
+        raise ValueError("집계에 응답자 가중치 배열이 없습니다 (panel=True로 집계해야 합니다).")
+    weights, col = summary["panel"]["weights"], {k: i for i, k in enumerate(summary["panel"]["keys"])}
+    keys, n = report_df.attrs.get("keys"), len(summary["panel"]["weights"])
+    if not n or not keys: return None, None
+    need = sorted({col[k] for pair in keys for k in pair if k is not None})
+    known = ~np.isnan(weights[:, need])
+    values = np.where(known, weights[:, need], 0.0)
+
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_boot, len(need)))
+    for lo in range(0, n_boot, batch):
+        b = min(batch, n_boot - lo)
+        picks = rng.integers(0, n, size=(b, n)) + np.arange(b)[:, None] * n
+        counts = np.bincount(picks.ravel(), minlength=b * n).reshape(b, n).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[lo:lo + b] = (counts @ values) / (counts @ known)
+
+    pos = {c: j for j, c in enumerate(need)}
+    def draws(key, default):
+        return means[:, pos[col[key]]] if key is not None else np.full(n_boot, default)
+    main = np.column_stack([draws(mk, 1.0) for mk, _ in keys])
+    sub = np.column_stack([draws(sk, np.nan) for _, sk in keys])
+    total = np.where(np.isnan(sub), main, main * sub)
+    ranks = 1 + (total[:, None, :] > total[:, :, None]).sum(axis=2)
+
+    q = [50 * (1 - level), 50 * (1 + level)]
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 소항목이 없는 행(전부 nan)의 구간은 nan
+        main_ci, sub_ci, total_ci = (np.nanpercentile(x, q, axis=0) for x in (main, sub, total))
+    rank_ci = np.percentile(ranks, q, axis=0, method="nearest").astype(int)
+    probs = np.stack([(ranks == r).mean(axis=0) for r in range(1, len(keys) + 1)], axis=1)
+
+    label = report_labels(report_df)
+    pct = f"{level:.0%}"
+    # 대항목 구간은 대항목 가중치가 표시된 행에만 둡니다 (기준이 하나뿐이면 가중치 1로 고정이라 생략).
+    has_main = report_df["대항목 가중치"].notna().to_numpy() & np.array([mk is not None for mk, _ in keys])
+    has_sub = np.array([sk is not None for _, sk in keys])
+    intervals = pd.DataFrame({
+        "항목": label,
+        f"대항목 가중치 {pct} 하한": np.where(has_main, main_ci[0], np.nan),
+        f"대항목 가중치 {pct} 상한": np.where(has_main, main_ci[1], np.nan),
+        f"소항목 가중치 {pct} 하한": np.where(has_sub, sub_ci[0], np.nan),
+        f"소항목 가중치 {pct} 상한": np.where(has_sub, sub_ci[1], np.nan),
+        f"종합 가중치 {pct} 하한": total_ci[0], f"종합 가중치 {pct} 상한": total_ci[1],
+        "순위": report_df["순위"].to_numpy(), "순위 하한": rank_ci[0], "순위 상한": rank_ci[1],
+        "현재 순위 확률": probs[np.arange(len(keys)), report_df["순위"].to_numpy() - 1],
+    })
+    rank_probs = pd.DataFrame(probs, columns=[f"{r}위" for r in range(1, len(keys) + 1)])
+    rank_probs.insert(0, "항목", label)
+    return intervals, rank_probs
+
+def format_report(report_df):
+    """화면·엑셀 표시용 문자열 표 (가중치·CR 소수 4자리, 'N위')."""
+    display_df = report_df.copy()
+    for c in ["대항목 가중치", "소항목 가중치", "종합 가중치", "그룹 CR"]:
+        display_df[c] = display_df[c].apply(lambda x: f"{x:.4f}" if pd.notnull(x) else "")
+    display_df["순위"] = display_df["순위"].apply(lambda x: f"{x}위")
+    return display_df
+
+XLSX_TIMESTAMP = "2000-01-01T00:00:00Z"
+
+def _normalize_xlsx(data):
+    """
+    openpyxl은 저장 시각을 문서 속성과 zip 항목 시각에 기록합니다. 같은 입력이면 같은 파일이 나오도록
+    두 값을 고정합니다 (야간 일괄 리포트의 변경 여부를 바이트 비교로 확인할 수 있도록).
+    """
+    src = zipfile.ZipFile(io.BytesIO(data))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            body = src.read(info.filename)
+            if info.filename == "docProps/core.xml":
+                body = re.sub(rb"(<dcterms:(created|modified)[^>]*>)[^<]*", rb"\g<1>" + XLSX_TIMESTAMP.encode(), body)
+            dst.writestr(zipfile.ZipInfo(info.filename, date_time=(1980, 1, 1, 0, 0, 0)), body,
+                         compress_type=zipfile.ZIP_DEFLATED)
+    return out.getvalue()
+
+def excel_report(display_df, file_path, intervals=None, rank_probs=None, limits=None, crossings=None):
+    """
+    최종 리포트 시트와 원본 데이터 시트(CSV를 청크 단위로 읽어 이어 씀)로 된 엑셀 파일을 만듭니다.
+    bootstrap_report의 결과를 넘기면 신뢰구간·순위 확률 시트를, sensitivity.crossover_points의 결과를 넘기면
+    민감도 임계값·순위 역전 지점 시트를 덧붙입니다.
+    같은 입력이면 바이트 단위로 같은 파일을 돌려줍니다.
+    """
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        display_df.to_excel(writer, sheet_name='1_최종_분석_결과', index=False)
+        row = 0
+        for chunk in iter_responses_since(file_path)[1]:
+            chunk.to_excel(writer, sheet_name='2_전체_원본_데이터', index=False, header=row == 0,
+                           startrow=row + (row > 0))
+            row += len(chunk)
+        if intervals is not None:
+            intervals.to_excel(writer, sheet_name='3_부트스트랩_신뢰구간', index=False)
+        if rank_probs is not None:
+            rank_probs.to_excel(writer, sheet_name='4_순위_확률', index=False)
+        if limits is not None:
+            limits.to_excel(writer, sheet_name='5_민감도_임계값', index=False)
+        if crossings is not None:
+            crossings.to_excel(writer, sheet_name='6_순위_역전_지점', index=False)
+    return _normalize_xlsx(output.getvalue())
+
+# ==============================================================================
+# [클래스] 세션 간 공유 결과 캐시 (LRU)
+# ==============================================================================
+class ResultCache:
+    """
+    (파일 경로, 분석 옵션) 별로 누적 집계(RunningSummary)를 보관합니다.
+    계산은 이진 저장소(response_store)에서 아직 분석하지 않은 행만 청크 단위로 수행하고,
+    저장소가 다시 만들어지면(원본 정리/삭제 후 재생성) 처음부터 계산합니다.
+    항목 수가 max_entries를 넘으면 가장 오래 사용하지 않은 항목부터 제거합니다.
+    계산은 항목별 잠금 안에서 하고 공용 잠금은 목록 조회·갱신에만 쓰므로, 한 프로젝트의 긴 계산이
+    다른 프로젝트나 다른 옵션의 요청을 막지 않습니다.
+    """
+
+    def __init__(self, max_entries=16, chunksize=CHUNK_ROWS):
+        self.max_entries = max_entries
+        self.chunksize = chunksize
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path, options, progress=None, panel=False):
+        """
+        반환값: (집계 dict, 새로 계산한 행 수). progress는 청크마다 (0~1] 진행률로 호출됩니다.
+        panel=True면 부트스트랩용 응답자 가중치 배열을 담은 집계를 돌려주며, 보관 중인 항목에 배열이 없으면 처음부터 다시 계산합니다.
+        """
+        key = (os.path.abspath(file_path), tuple(options))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key) or {}
+            # 저장소 동기화도 CSV를 청크 단위로 읽어 추가분만 반영합니다.
+            store = open_store(file_path)
+            if entry.get("store_generation") != store.generation or entry["store_rows"] > store.n_rows \
+                    or (panel and not entry["running"].keep_panel):
+                entry = {"running": RunningSummary(options.cr_threshold, options.method, keep_panel=panel),
+                         "summary": None, "store_rows": 0, "store_generation": store.generation}
+            start = entry["store_rows"]
+            for stop, chunk in iter_store_chunks(store, options, start, self.chunksize):
+                entry["running"].add(chunk)
+                entry["store_rows"], entry["summary"] = stop, None
+                if progress: progress((stop - start) / max(store.n_rows - start, 1))
+            if entry["summary"] is None:
+                entry["summary"] = entry["running"].result()
+
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    old, _ = self._entries.popitem(last=False)
+                    old_lock = self._key_locks.get(old)
+                    if old_lock is not None and not old_lock.locked(): del self._key_locks[old]
+            return entry["summary"], entry["store_rows"] - start
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None:
+                self._entries.clear(); return
+            target = os.path.abspath(file_path)
+            for key in [k for k in self._entries if k[0] == target]:
+                del self._entries[key]
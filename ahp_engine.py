@@ -0,0 +1,339 @@
+import numpy as np
+
+# ==============================================================================
+# [상수] Saaty 무작위 일관성 지수(RI)
+# ==============================================================================
+RI_TABLE = {1: 0, 2: 0, 3: 0.58, 4: 0.90, 5: 1.12, 6: 1.24, 7: 1.32, 8: 1.41, 9: 1.45}
+
+def random_index(n):
+    return RI_TABLE.get(n, 1.49)
+
+def consistency_ratio(lambda_max, n):
+    """λmax(스칼라 또는 배열)로부터 CR을 계산합니다."""
+    lambda_max = np.asarray(lambda_max, dtype=float)
+    ri = random_index(n)
+    if n <= 1 or ri == 0:
+        return np.zeros_like(lambda_max)
+    return ((lambda_max - n) / (n - 1)) / ri
+
+# ==============================================================================
+# [함수] 비교 데이터 → 행렬 변환
+# ==============================================================================
+def parse_comparisons(comparisons):
+    """{"A vs B": "3.00"} 형태의 응답을 정렬된 항목 목록과 {(A, B): 3.0} 으로 변환합니다."""
+    norm_comps = {}
+    items = set()
+    for pair, val in comparisons.items():
+        if " vs " in pair:
+            a, b = pair.split(" vs ")
+            a, b = a.strip(), b.strip()
+            items.add(a); items.add(b)
+            norm_comps[(a, b)] = float(val)
+    return sorted(list(items)), norm_comps
+
+def build_matrix_stack(items, comparisons_list, missing=1.0):
+    """
+    같은 항목 구성을 가진 응답자들의 비교값을 (K, n, n) 행렬 묶음으로 쌓습니다.
+    응답하지 않은 비교쌍은 missing으로 채웁니다 (np.nan이면 불완전 행렬로 보고 complete_stack이 채웁니다).
+    """
+    n = len(items)
+    item_map = {name: i for i, name in enumerate(items)}
+    stack = np.full((len(comparisons_list), n, n), missing, dtype=float)
+    stack[:, np.arange(n), np.arange(n)] = 1.0
+    ks, rows, cols, vals = [], [], [], []
+    for k, comps in enumerate(comparisons_list):
+        for (a, b), val in comps.items():
+            if a in item_map and b in item_map:
+                ks.append(k); rows.append(item_map[a]); cols.append(item_map[b]); vals.append(val)
+    if ks:
+        vals = np.asarray(vals, dtype=float)
+        with np.errstate(divide="ignore"):
+            stack[ks, rows, cols] = vals
+            stack[ks, cols, rows] = 1 / vals
+    return stack
+
+# ==============================================================================
+# [함수] 불완전 비교 행렬 (질문 수를 줄인 설문)
+# ==============================================================================
+def _connected(known):
+    """(K, n, n) 응답 여부 행렬에서 비교 그래프가 연결되어 있는지 (K,) bool로 돌려줍니다."""
+    k, n = known.shape[0], known.shape[1]
+    reach = known | np.eye(n, dtype=bool)[None]
+    for _ in range(max(1, int(np.ceil(np.log2(max(n, 2)))))):
+        reach = np.einsum("kij,kjl->kil", reach.astype(np.int32), reach.astype(np.int32)) > 0
+    return reach[:, 0].all(axis=1) if n else np.ones(k, dtype=bool)
+
+def complete_stack(stack):
+    """
+    nan으로 표시된 빠진 비교쌍을 Harker 방법으로 채웁니다.
+    빠진 칸을 0, 대각을 1 + (그 행의 빠진 칸 수)로 둔 행렬의 주 고유벡터 w를 구하고 빠진 a_ij를 w_i / w_j로 채우면,
+    채운 행렬의 λmax가 Harker 행렬의 λmax와 같으므로 이후 가중치·CR 계산을 그대로 쓸 수 있습니다.
+    비교 그래프가 끊어져 있거나 응답값에 inf/0이 있는 행렬은 빠진 칸을 1로 채웁니다 (기존 방식).
+    """
+    stack = np.array(stack, dtype=float)
+    if stack.ndim != 3 or not stack.shape[0]: return stack
+    n = stack.shape[1]
+    known = ~np.isnan(stack)
+    with np.errstate(invalid="ignore"):
+        valid = (np.where(known, stack, 1.0) > 0).all(axis=(1, 2)) & np.isfinite(np.where(known, stack, 1.0)).all(axis=(1, 2))
+    target = (~known).any(axis=(1, 2)) & valid & _connected(known)
+    if target.any():
+        sub, sub_known = stack[target], known[target]
+        harker = np.where(sub_known, sub, 0.0)
+        harker[:, np.arange(n), np.arange(n)] = 1.0 + (~sub_known).sum(axis=2)
+        eigvals, eigvecs = np.linalg.eig(harker)
+        idx = np.argmax(eigvals.real, axis=1)
+        w = np.abs(eigvecs[np.arange(len(idx)), :, idx].real)
+        w /= w.sum(axis=1, keepdims=True)
+        stack[target] = np.where(sub_known, sub, w[:, :, None] / w[:, None, :])
+    return np.nan_to_num(stack, nan=1.0)
+
+# ==============================================================================
+# [함수] 가중치 산출 방식 (prioritization)
+# ==============================================================================
+def _lambda_from_weights(stack, weights):
+    """λmax ≈ mean_i((Aw)_i / w_i) — w가 주 고유벡터이면 정확히 λmax와 같습니다."""
+    return (np.einsum("kij,kj->ki", stack, weights) / weights).mean(axis=1)
+
+def _geometric_weights(stack):
+    """행 기하평균(설문 화면 JS의 calculateWeights와 같은 방식)."""
+    w = np.exp(np.log(stack).mean(axis=2))
+    return w / w.sum(axis=1, keepdims=True)
+
+def _finite_only(fn):
+    """inf/nan이 포함된 행렬은 균등 가중치와 CR 1.0으로 처리하고, 나머지에만 fn을 적용합니다."""
+    def wrapper(stack, warm_start=None, **kwargs):
+        stack = np.asarray(stack, dtype=float)
+        k, n = stack.shape[0], stack.shape[1]
+        if n == 0:
+            return np.ones((k, 0)), np.full(k, np.nan), np.ones(k)
+        weights = np.full((k, n), 1.0 / n)
+        lambda_max = np.full(k, np.nan)
+        ok = np.isfinite(stack).all(axis=(1, 2))
+        with np.errstate(divide="ignore"):
+            ok &= (stack > 0).all(axis=(1, 2))
+        if ok.any():
+            try:
+                ws = None if warm_start is None else np.asarray(warm_start, dtype=float)[ok]
+                weights[ok], lambda_max[ok] = fn(stack[ok], warm_start=ws, **kwargs)
+            except np.linalg.LinAlgError:
+                ok[:] = False
+        cr = consistency_ratio(lambda_max, n)
+        cr[~ok] = 1.0
+        return weights, lambda_max, cr
+    return wrapper
+
+@_finite_only
+def _eigen_method(stack, warm_start=None):
+    eigvals, eigvecs = np.linalg.eig(stack)
+    real = eigvals.real
+    max_idx = np.argmax(real, axis=1)
+    rows = np.arange(len(max_idx))
+    w = eigvecs[rows, :, max_idx].real
+    return w / w.sum(axis=1, keepdims=True), real[rows, max_idx]
+
+@_finite_only
+def _power_method(stack, warm_start=None, tol=1e-10, max_iter=200):
+    # 시작점: 이전 결과(warm_start) 또는 기하평균 가중치(주 고유벡터에 매우 가까움)
+    w = _geometric_weights(stack) if warm_start is None else warm_start / warm_start.sum(axis=1, keepdims=True)
+    active = np.arange(len(w))
+    for _ in range(max_iter):
+        if not len(active): break
+        nxt = np.einsum("kij,kj->ki", stack[active], w[active])
+        nxt /= nxt.sum(axis=1, keepdims=True)
+        moved = np.abs(nxt - w[active]).max(axis=1) > tol
+        w[active] = nxt
+        active = active[moved]
+    return w, _lambda_from_weights(stack, w)
+
+@_finite_only
+def _geometric_method(stack, warm_start=None):
+    w = _geometric_weights(stack)
+    return w, _lambda_from_weights(stack, w)
+
+PRIORITY_METHODS = {
+    "eigen": _eigen_method,
+    "power": _power_method,
+    "geometric": _geometric_method,
+}
+
+def prioritize(stack, method="eigen", warm_start=None):
+    """
+    (K, n, n) 행렬 묶음에 대해 한 번의 계산으로 weights (K, n), lambda_max (K,), cr (K,)을 구합니다.
+    - "eigen": 전체 고유값 분해 (np.linalg.eig)
+    - "power": 거듭제곱법. warm_start (K, n)가 있으면 그 가중치에서 시작합니다.
+    - "geometric": 행 기하평균. λmax는 mean((Aw)_i / w_i)로 추정합니다.
+    """
+    if method not in PRIORITY_METHODS:
+        raise ValueError(f"알 수 없는 가중치 산출 방식: {method}")
+    return PRIORITY_METHODS[method](stack, warm_start=warm_start)
+
+def batch_ahp_metrics(stack):
+    """
+    (K, n, n) 행렬 묶음을 한 번의 np.linalg.eig 호출로 분석합니다.
+    반환값: weights (K, n), lambda_max (K,), cr (K,)
+    계산할 수 없는 행렬(inf/nan 포함)은 균등 가중치와 CR 1.0으로 처리합니다.
+    """
+    return prioritize(stack, "eigen")
+
+# ==============================================================================
+# [함수] 단일 행렬용 분석 & 보정 (기존 API 유지)
+# ==============================================================================
+def get_cr(matrix, n, method="eigen"):
+    return float(prioritize(np.asarray(matrix, dtype=float)[None], method)[2][0])
+
+def calibrate_matrix(matrix, target_cr=0.1, max_iter=50, max_scale=5.0, method="eigen"):
+    stack, _, _, _ = calibrate_stack(np.asarray(matrix, dtype=float)[None], target_cr=target_cr, max_scale=max_scale,
+                                     calibration="iterative", max_iter=max_iter, method=method)
+    return stack[0]
+
+def calculate_ahp_metrics(comparisons, do_calibration=False, cr_limit=0.1, max_scale=5.0, method="eigen",
+                          calibration="iterative"):
+    items, norm_comps = parse_comparisons(comparisons)
+    weights, cr, calibrated, _ = analyze_task_panel(
+        items, [norm_comps], do_calibration=do_calibration, cr_limit=cr_limit,
+        max_scale=max_scale, calibration=calibration, method=method
+    )
+    return items, weights[0], float(cr[0]), bool(calibrated[0])
+
+# ==============================================================================
+# [함수] 일괄(batched) 일관성 보정
+# ==============================================================================
+CALIBRATION_METHODS = ("search", "iterative")
+
+def _perfect_stack(weights, max_scale):
+    """가중치 벡터 묶음 (K, n)으로부터 완전 일관 행렬 w_i/w_j 를 만들고 배수 제한을 적용합니다."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = weights[:, :, None] / weights[:, None, :]
+    ratio = np.where(weights[:, None, :] != 0, ratio, 1.0)
+    return np.clip(ratio, 1 / max_scale, max_scale)
+
+def _blend_stack(stack, perfect, t, max_scale):
+    """원본과 완전 일관 행렬을 t(0~1) 비율로 섞은 뒤, 배수 제한과 역수 대칭을 복원합니다."""
+    t = np.asarray(t, dtype=float)[:, None, None]
+    blended = np.clip((1 - t) * stack + t * perfect, 1 / max_scale, max_scale)
+    n = blended.shape[1]
+    iu, ju = np.triu_indices(n, 1)
+    blended[:, ju, iu] = 1.0 / blended[:, iu, ju]
+    blended[:, np.arange(n), np.arange(n)] = 1.0
+    return blended
+
+def calibrate_stack(stack, target_cr=0.1, max_scale=5.0, calibration="search", max_iter=None, xtol=1e-3, cr_tol=0.005,
+                    method="eigen", weights=None, cr=None):
+    """
+    CR이 target_cr을 넘는 행렬 묶음 (K, n, n)을 한꺼번에 보정합니다.
+    반환값: 보정된 행렬 (K, n, n), weights (K, n), cr (K,), 행렬별 반복 횟수 (K,)
+    method는 가중치 산출 방식(prioritize)이며, 반복마다 행렬당 한 번만 계산합니다.
+    이미 계산한 원본 행렬의 weights와 cr을 넘기면 첫 prioritize를 건너뛰고 그 값에서 시작합니다.
+
+    - "search": 원본 가중치로 만든 완전 일관 행렬과의 혼합 비율 t 중 target_cr을 만족하는
+      가장 작은 값을 직접 탐색합니다. √CR이 t에 대해 거의 선형이므로 구간을 유지하는
+      할선법(Illinois)으로 보통 1~3회 만에 수렴하며, 반복마다 수렴하지 않은 행렬만 계산합니다.
+    - "iterative": 기존 calibrate_matrix와 같은 고정 α=0.8 반복을 행렬 묶음 단위로 수행합니다.
+    """
+    if calibration not in CALIBRATION_METHODS:
+        raise ValueError(f"알 수 없는 보정 방식: {calibration}")
+    stack = np.array(stack, dtype=float)
+    k = stack.shape[0]
+    if weights is None or cr is None:
+        weights, _, cr = prioritize(stack, method)
+    else:
+        weights, cr = np.array(weights, dtype=float), np.array(cr, dtype=float)
+    iterations = np.zeros(k, dtype=int)
+    if k == 0 or stack.shape[1] < 3:
+        return stack, weights, cr, iterations
+
+    if calibration == "iterative":
+        max_iter = 50 if max_iter is None else max_iter
+        active = np.flatnonzero(cr > target_cr)
+        for _ in range(max_iter):
+            if not len(active): break
+            perfect = _perfect_stack(weights[active], max_scale)
+            stack[active] = _blend_stack(stack[active], perfect, np.full(len(active), 0.2), max_scale)
+            weights[active], _, cr[active] = prioritize(stack[active], method, warm_start=weights[active])
+            iterations[active] += 1
+            active = active[cr[active] > target_cr]
+        return stack, weights, cr, iterations
+
+    max_iter = 20 if max_iter is None else max_iter
+    targets = np.flatnonzero(cr > target_cr)
+    if not len(targets):
+        return stack, weights, cr, iterations
+
+    original = stack[targets]
+    perfect = _perfect_stack(weights[targets], max_scale)
+    m = len(targets)
+    root = np.sqrt(target_cr)
+    # g(t) = √CR(t) - √target: t=0 에서는 양수, t=1(완전 일관)에서는 -√target 으로 가정합니다.
+    lo, hi = np.zeros(m), np.ones(m)
+    g_lo, g_hi = np.sqrt(np.maximum(cr[targets], 0)) - root, np.full(m, -root)
+    side = np.zeros(m, dtype=int)
+    best, best_w, best_cr = original.copy(), weights[targets].copy(), cr[targets].copy()
+    found = np.zeros(m, dtype=bool)
+
+    active = np.arange(m)
+    for _ in range(max_iter):
+        if not len(active): break
+        a = active
+        t = lo[a] - g_lo[a] * (hi[a] - lo[a]) / (g_hi[a] - g_lo[a])
+        trial = _blend_stack(original[a], perfect[a], t, max_scale)
+        trial_w, _, trial_cr = prioritize(trial, method, warm_start=best_w[a])
+        iterations[targets[a]] += 1
+        g = np.sqrt(np.maximum(trial_cr, 0)) - root
+
+        ok = g <= 0
+        up, down = a[ok], a[~ok]
+        hi[up], g_hi[up] = t[ok], g[ok]
+        lo[down], g_lo[down] = t[~ok], g[~ok]
+        # Illinois 보정: 같은 쪽 끝점이 연속으로 갱신되면 반대쪽 함수값을 절반으로 줄입니다.
+        g_lo[up[side[up] == 1]] /= 2
+        g_hi[down[side[down] == -1]] /= 2
+        side[up], side[down] = 1, -1
+        best[up], best_w[up], best_cr[up] = trial[ok], trial_w[ok], trial_cr[ok]
+        found[up] = True
+
+        done = (hi[a] - lo[a] < xtol) | (ok & (target_cr - trial_cr <= cr_tol))
+        active = a[~done]
+
+    # 한 번도 목표를 만족하지 못한 행렬은 완전 일관 행렬(t=1)을 최선값으로 사용합니다.
+    missing = np.flatnonzero(~found)
+    if len(missing):
+        best[missing] = _blend_stack(original[missing], perfect[missing], np.ones(len(missing)), max_scale)
+        best_w[missing], _, best_cr[missing] = prioritize(best[missing], method, warm_start=best_w[missing])
+        iterations[targets[missing]] += 1
+
+    stack[targets], weights[targets], cr[targets] = best, best_w, best_cr
+    return stack, weights, cr, iterations
+
+# ==============================================================================
+# [함수] 응답자 패널 전체 일괄 분석
+# ==============================================================================
+def analyze_stack(stack, do_calibration=False, cr_limit=0.1, max_scale=5.0, calibration="search", method="eigen"):
+    """
+    (K, n, n) 행렬 묶음을 분석하고 필요하면 보정합니다. nan(빠진 비교쌍)이 있으면 complete_stack으로 먼저 채웁니다.
+    반환값: weights (K, n), cr (K,), calibrated (K,) bool, 보정 반복 횟수 (K,)
+    """
+    stack = np.asarray(stack, dtype=float)
+    if np.isnan(stack).any():
+        stack = complete_stack(stack)
+    weights, _, cr = prioritize(stack, method)
+    calibrated = np.zeros(len(stack), dtype=bool)
+    iterations = np.zeros(len(stack), dtype=int)
+    if do_calibration:
+        targets = np.flatnonzero(cr > cr_limit)
+        if len(targets):
+            _, weights[targets], cr[targets], iterations[targets] = calibrate_stack(
+                stack[targets], target_cr=cr_limit, max_scale=max_scale, calibration=calibration, method=method,
+                weights=weights[targets], cr=cr[targets]
+            )
+            calibrated[targets] = True
+    return weights, cr, calibrated, iterations
+
+def analyze_task_panel(items, comparisons_list, do_calibration=False, cr_limit=0.1, max_scale=5.0,
+                       calibration="search", method="eigen"):
+    """
+    한 과제(task)에 대한 K명의 응답을 한꺼번에 분석합니다.
+    반환값: weights (K, n), cr (K,), calibrated (K,) bool, 보정 반복 횟수 (K,)
+    """
+    return analyze_stack(build_matrix_stack(items, comparisons_list, missing=np.nan), do_calibration=do_calibration,
+                         cr_limit=cr_limit, max_scale=max_scale, calibration=calibration, method=method)
@@ -0,0 +1,613 @@
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from google import genai
+
+from structure_check import check_group, local_result
+from survey_store import DATA_FOLDER
+
+# ==============================================================================
+# [설정] 사용할 모델 (앞쪽부터 우선 시도)
+# ==============================================================================
+MODELS = [
+    'gemini-2.5-flash-lite',
+    'gemini-2.0-flash-lite-preview-02-05',
+    'gemini-2.5-flash',
+    'gemini-2.0-flash',
+    'gemini-2.0-pro-exp-02-05'
+]
+
+CACHE_PATH = os.path.join(DATA_FOLDER, ".ai_diagnosis_cache.sqlite3")
+
+EMPTY_RESULT = {"grade": "오류", "summary": "분석 실패", "suggestion": "잠시 후 시도", "example": "", "detail": "API 호출량 초과"}
+
+# ==============================================================================
+# [함수] 키별 클라이언트 (전역 genai.configure 대신 키마다 독립 클라이언트)
+# ==============================================================================
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key):
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = _clients[api_key] = genai.Client(api_key=api_key)
+        return client
+
+# ==============================================================================
+# [함수] 프롬프트 & 응답 파싱
+# ==============================================================================
+def _precheck_notes(goal, parent, children):
+    """로컬 점검에서 찾은 참고 사항을 프롬프트에 붙일 한 줄로 만듭니다 (없으면 빈 문자열)."""
+    notes = [i["message"] for i in check_group(goal, parent, children) if i["level"] == "warning"]
+    return f"(사전 점검: {'; '.join(notes)})" if notes else ""
+
+def build_prompt(goal, parent, children):
+    is_main = (goal == parent)
+    scope_guide = "1차 평가 기준의 균형성(MECE)을 중심으로 진단." if is_main else f"상위 기준 '{parent}'의 하위 세부 항목 적절성만 진단(다른 기준 언급 금지)."
+    return f"""
+    [분석 대상]
+    - 목표: {goal}
+    - 기준: {parent}
+    - 하위: {children} {_precheck_notes(goal, parent, children)}
+
+    [지침 1: 태도]
+    - 주제가 전문적이면 '냉철한 컨설턴트', 일상적이면 '친절한 멘토' 톤.
+    - {scope_guide}
+
+    [지침 2: 형식]
+    - **한국어** 작성.
+    - **특수문자(**, *) 사용 금지.**
+    - [EXAMPLE]은 설명 없이 **추천 항목 명사**만 나열.
+
+    [출력 포맷]
+    [GRADE] 적합/보완필요/부적합
+    [SUMMARY] (1줄 요약)
+    [SUGGESTION] (1줄 제안)
+    [EXAMPLE]
+    - 항목1
+    - 항목2
+    - 항목3
+    [DETAIL]
+    1. 구성: (내용)
+    2. 위계: (내용)
+    3. 용어: (내용)
+    """
+
+def extract_tag(tag, text):
+    match = re.search(fr"\[{tag}\](.*?)(?=\[|$)", text, re.DOTALL | re.IGNORECASE)
+    if match:
+        c = match.group(1).strip()
+        c = c.replace("**", "").replace("*", "")
+        return re.sub(r"^[\s\:\-]]+|[\s\]\:\-]+$", "", c).strip()
+    return "-"
+
+def parse_response(text):
+    return {
+        "grade": extract_tag("GRADE", text),
+        "summary": extract_tag("SUMMARY", text),
+        "suggestion": extract_tag("SUGGESTION", text),
+        "example": extract_tag("EXAMPLE", text),
+        "detail": extract_tag("DETAIL", text)
+    }
+
+# ==============================================================================
+# [클래스] 키·모델 스케줄러 (프로세스 전체에서 공유)
+# ==============================================================================
+def _classify_error(error):
+    """API 오류를 'quota'(429), 'auth'(잘못된 키), 'other'로 나눕니다."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    text = str(error)
+    if code == 429 or "429" in text or "RESOURCE_EXHAUSTED" in text or "quota" in text.lower():
+        return "quota"
+    if code in (401, 403) or "API_KEY_INVALID" in text or "PERMISSION_DENIED" in text:
+        return "auth"
+    return "other"
+
+def _retry_delay(error):
+    """오류 메시지에 서버가 알려준 재시도 대기 시간(retryDelay / retry in Ns)이 있으면 초 단위로 돌려줍니다."""
+    match = re.search(r"retry(?:Delay)?['\"]?\s*(?:[:=]|in)\s*['\"]?([\d.]+)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+class KeyScheduler:
+    """
+    (키, 모델) 쌍마다 최근 1분 호출 수, 한도 초과(429) 대기 시각, 평균 응답 시간을 기억합니다.
+    요청마다 대기 중이 아닌 쌍을 모델 우선순위 → 진행 중 호출 수 → 평균 응답 시간 순으로 먼저 내주고,
+    429를 받은 쌍은 서버가 알려준 시간(없으면 30초부터 두 배씩, 최대 10분) 동안 건너뜁니다.
+    429가 났을 때의 1분 호출 수를 그 쌍의 분당 한도로 학습해, 한도에 닿은 쌍도 미리 피합니다.
+    학습한 한도는 대기 시간이 끝나고 1분(window)이 더 지나면 잊고, 한도만큼 호출해도 성공하면 하나씩 올립니다
+    (일일 할당량 429나 동시 호출 폭주로 낮게 잡힌 한도가 프로세스 내내 남지 않도록).
+    """
+
+    def __init__(self, models=MODELS, base_cooldown=30.0, max_cooldown=600.0, auth_cooldown=3600.0,
+                 error_cooldown=5.0, window=60.0):
+        self.models = list(models)
+        self.base_cooldown, self.max_cooldown = base_cooldown, max_cooldown
+        self.auth_cooldown, self.error_cooldown, self.window = auth_cooldown, error_cooldown, window
+        self._pairs = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "quota_errors": 0,
+                         "exhausted": 0, "failover_seconds": 0.0}
+
+    def _pair(self, key, model):
+        state = self._pairs.get((key, model))
+        if state is None:
+            state = self._pairs[(key, model)] = {
+                "cooldown_until": 0.0, "strikes": 0, "rpm_limit": None, "rpm_until": 0.0, "recent": [],
+                "in_flight": 0, "latency": None, "successes": 0, "failures": 0,
+            }
+        return state
+
+    def _trim(self, state, now):
+        recent = state["recent"]
+        while recent and recent[0] <= now - self.window:
+            recent.pop(0)
+        if state["rpm_limit"] and state["rpm_until"] <= now:
+            state["rpm_limit"] = None
+
+    def candidates(self, api_keys):
+        """지금 바로 쓸 수 있는 (키, 모델) 쌍을 우선순위 순으로 돌려줍니다."""
+        now = time.time()
+        ranked = []
+        with self._lock:
+            for m_idx, model in enumerate(self.models):
+                keys = list(api_keys)
+                random.shuffle(keys)  # 같은 조건이면 키를 고르게 돌려 씁니다.
+                for key in keys:
+                    state = self._pair(key, model)
+                    if state["cooldown_until"] > now: continue
+                    self._trim(state, now)
+                    if state["rpm_limit"] and len(state["recent"]) >= state["rpm_limit"]: continue
+                    ranked.append(((m_idx, state["in_flight"], state["latency"] or 0.0), key, model))
+        ranked.sort(key=lambda r: r[0])
+        return [(key, model) for _, key, model in ranked]
+
+    def exhausted(self, api_keys):
+        """쓸 수 있는 쌍이 없어 요청이 실패했음을 기록하고, 가장 먼저 풀리는 쌍까지 남은 초를 돌려줍니다."""
+        now = time.time()
+        with self._lock:
+            self.counters["exhausted"] += 1
+            waits = [self._pair(k, m)["cooldown_until"] - now for k in api_keys for m in self.models]
+        return max(0.0, min(waits)) if waits else 0.0
+
+    def begin(self, key, model):
+        now = time.time()
+        with self._lock:
+            state = self._pair(key, model)
+            self._trim(state, now)
+            state["recent"].append(now)
+            state["in_flight"] += 1
+            self.counters["calls"] += 1
+        return now
+
+    def success(self, key, model, started):
+        elapsed = time.time() - started
+        with self._lock:
+            state = self._pair(key, model)
+            state["in_flight"] -= 1
+            state["successes"] += 1
+            state["strikes"] = 0
+            if state["rpm_limit"] and len(state["recent"]) >= state["rpm_limit"]:
+                state["rpm_limit"] += 1
+            state["latency"] = elapsed if state["latency"] is None else 0.8 * state["latency"] + 0.2 * elapsed
+            self.counters["successes"] += 1
+
+    def failure(self, key, model, started, error):
+        now = time.time()
+        kind = _classify_error(error)
+        with self._lock:
+            state = self._pair(key, model)
+            state["in_flight"] -= 1
+            state["failures"] += 1
+            self.counters["failures"] += 1
+            self.counters["failover_seconds"] += now - started
+            if kind == "quota":
+                self.counters["quota_errors"] += 1
+                self._trim(state, now)
+                if len(state["recent"]) > 1:
+                    state["rpm_limit"] = len(state["recent"]) - 1
+                state["strikes"] += 1
+                delay = _retry_delay(error) or min(self.max_cooldown, self.base_cooldown * 2 ** (state["strikes"] - 1))
+                state["cooldown_until"] = max(state["cooldown_until"], now + delay)
+                state["rpm_until"] = state["cooldown_until"] + self.window
+            elif kind == "auth":
+                # 잘못된 키는 모든 모델에서 함께 제외합니다.
+                for model_name in self.models:
+                    self._pair(key, model_name)["cooldown_until"] = now + self.auth_cooldown
+            else:
+                state["cooldown_until"] = max(state["cooldown_until"], now + self.error_cooldown)
+        return kind
+
+    def stats(self):
+        """전체 카운터와 (키 끝 4자리, 모델)별 상태 목록."""
+        now = time.time()
+        with self._lock:
+            pairs = [{
+                "key": f"...{key[-4:]}", "model": model,
+                "successes": s["successes"], "failures": s["failures"],
+                "latency": None if s["latency"] is None else round(s["latency"], 2),
+                "cooldown": round(max(0.0, s["cooldown_until"] - now), 1),
+                "rpm_limit": s["rpm_limit"],
+            } for (key, model), s in self._pairs.items() if s["successes"] or s["failures"]]
+            return {**self.counters, "pairs": pairs}
+
+SCHEDULER = KeyScheduler()
+
+# ==============================================================================
+# [클래스] 진단 결과 캐시 (SQLite, LRU + TTL)
+# ==============================================================================
+def normalize_children(children):
+    """공백을 정리하고 빈 항목을 뺀 뒤 정렬합니다 (순서만 바뀐 그룹도 같은 키가 됩니다)."""
+    return sorted({" ".join(str(c).split()) for c in children if str(c).strip()})
+
+class DiagnosisCache:
+    """
+    (목표, 상위 기준, 정규화한 하위 항목, 모델) 별로 진단 결과를 보관합니다.
+    조회할 때는 MODELS 우선순위가 높은 모델의 결과부터 찾고, ttl초가 지난 항목은 무시·삭제하며,
+    max_entries를 넘으면 가장 오래 사용하지 않은 항목부터 지웁니다. 실패한 진단은 저장하지 않습니다.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=2000, ttl=30 * 24 * 3600):
+        self.path, self.max_entries, self.ttl = path, max_entries, ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS diagnosis (
+                key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, model))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS diagnosis_lru ON diagnosis (last_used)")
+
+    @contextmanager
+    def _db(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(goal, parent, children):
+        payload = json.dumps([" ".join(str(goal).split()), " ".join(str(parent).split()), normalize_children(children)],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, goal, parent, children, models=MODELS):
+        key, now = self.make_key(goal, parent, children), time.time()
+        with self._db() as conn:
+            rows = dict(conn.execute("SELECT model, result FROM diagnosis WHERE key = ? AND created > ?",
+                                     (key, now - self.ttl)).fetchall())
+            for model in list(models) + sorted(set(rows) - set(models)):
+                if model in rows:
+                    conn.execute("UPDATE diagnosis SET last_used = ? WHERE key = ? AND model = ?", (now, key, model))
+                    return {**json.loads(rows[model]), "cached": True, "model": model}
+        return None
+
+    def put(self, goal, parent, children, model, result):
+        key, now = self.make_key(goal, parent, children), time.time()
+        result = {k: v for k, v in result.items() if k not in ("cached", "model")}
+        with self._db() as conn:
+            conn.execute("INSERT OR REPLACE INTO diagnosis (key, model, result, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                         (key, model, json.dumps(result, ensure_ascii=False), now, now))
+            conn.execute("DELETE FROM diagnosis WHERE created <= ?", (now - self.ttl,))
+            conn.execute("""DELETE FROM diagnosis WHERE rowid IN (
+                SELECT rowid FROM diagnosis ORDER BY last_used DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def clear(self):
+        with self._db() as conn:
+            conn.execute("DELETE FROM diagnosis")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """프로세스에서 공유하는 기본 캐시 (처음 사용할 때 파일을 엽니다)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiagnosisCache()
+        return _cache
+
+# ==============================================================================
+# [함수] 모델 호출 (스케줄러가 고른 쌍을 차례로 시도)
+# ==============================================================================
+def generate(prompt, api_keys, scheduler=None, config=None):
+    """반환값: (응답 텍스트, 응답한 모델, 오류 메시지). 모든 쌍이 실패하면 텍스트와 모델은 None입니다."""
+    scheduler = scheduler or SCHEDULER
+    last_error = ""
+    for key, model_name in scheduler.candidates(api_keys):
+        started = scheduler.begin(key, model_name)
+        try:
+            response = get_client(key).models.generate_content(model=model_name, contents=prompt, config=config)
+        except Exception as e:
+            scheduler.failure(key, model_name, started, e)
+            last_error = str(e)
+            continue
+        scheduler.success(key, model_name, started)
+        return response.text, model_name, ""
+
+    wait = scheduler.exhausted(api_keys)
+    hint = f" 약 {wait:.0f}초 후 다시 시도하세요." if wait else ""
+    last = f" (Last: {last_error})" if last_error else ""
+    return None, None, f"모든 키와 모델이 한도 초과입니다.{hint}{last}"
+
+def stream_text(prompt, api_keys, outcome, scheduler=None, config=None):
+    """
+    generate의 스트리밍 버전. 응답 조각(텍스트)을 도착하는 대로 내보냅니다.
+    첫 조각이 오기 전에 실패하면 다음 쌍으로 넘어가고, 도중에 끊기면 받은 만큼만 남깁니다.
+    outcome["model"]은 첫 조각이 도착할 때 채워지고, 끝나면 outcome["error"]도 채워집니다 (모두 실패하면 model은 None).
+    """
+    scheduler = scheduler or SCHEDULER
+    outcome.update(model=None, error="")
+    last_error = ""
+    for key, model_name in scheduler.candidates(api_keys):
+        started = scheduler.begin(key, model_name)
+        received = False
+        try:
+            for chunk in get_client(key).models.generate_content_stream(model=model_name, contents=prompt, config=config):
+                text = getattr(chunk, "text", None)
+                if text:
+                    if not received:
+                        received = True
+                        outcome["model"] = model_name
+                    yield text
+        except Exception as e:
+            scheduler.failure(key, model_name, started, e)
+            last_error = str(e)
+            if not received: continue
+            outcome["error"] = last_error
+            return
+        scheduler.success(key, model_name, started)
+        outcome["model"] = model_name
+        return
+
+    wait = scheduler.exhausted(api_keys)
+    hint = f" 약 {wait:.0f}초 후 다시 시도하세요." if wait else ""
+    last = f" (Last: {last_error})" if last_error else ""
+    outcome["error"] = f"모든 키와 모델이 한도 초과입니다.{hint}{last}"
+
+# ==============================================================================
+# [클래스] 스트리밍 응답 점진 파싱
+# ==============================================================================
+class TagStreamParser:
+    """
+    [GRADE] … [DETAIL] 형식 응답을 조각 단위로 받아, 다음 태그가 시작되어 내용이 확정된 태그만 돌려줍니다.
+    마지막 태그는 close()에서 확정됩니다.
+    """
+    TAGS = ("GRADE", "SUMMARY", "SUGGESTION", "EXAMPLE", "DETAIL")
+    _pattern = re.compile(r"\[(" + "|".join(TAGS) + r")\]", re.IGNORECASE)
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+
+    def feed(self, chunk):
+        """반환값: 이번 조각으로 새로 확정된 {필드: 값}"""
+        self.text += chunk
+        matches = list(self._pattern.finditer(self.text))
+        new = {}
+        for m, nxt in zip(matches, matches[1:]):
+            field = m.group(1).lower()
+            if field in self.fields: continue
+            self.fields[field] = new[field] = extract_tag(m.group(1).upper(), self.text[m.start():nxt.start()])
+        return new
+
+    def close(self):
+        self.fields = parse_response(self.text)
+        return self.fields
+
+class JsonGroupStream:
+    """{"groups": [{...}, {...}]} 응답을 조각 단위로 받아, 닫는 중괄호까지 도착한 그룹 객체를 하나씩 돌려줍니다."""
+
+    def __init__(self):
+        self.text = ""
+        self._pos = None
+        self._depth, self._in_string, self._escape, self._start = 0, False, False, None
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self._pos is None:
+            m = re.search(r'"groups"\s*:\s*\[', self.text)
+            if not m: return []
+            self._pos = m.end()
+        done = []
+        for i in range(self._pos, len(self.text)):
+            ch = self.text[i]
+            if self._in_string:
+                if self._escape: self._escape = False
+                elif ch == "\\": self._escape = True
+                elif ch == '"': self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0: self._start = i
+                self._depth += 1
+            elif ch == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    try: done.append(json.loads(self.text[self._start:i + 1]))
+                    except ValueError: pass
+        self._pos = len(self.text)
+        return done
+
+# ==============================================================================
+# [함수] 그룹 하나 진단
+# ==============================================================================
+def _answer_without_api(goal, parent, children, api_keys, cache, refresh):
+    """
+    API를 부르지 않고 답할 수 있으면 결과를, 아니면 None을 돌려줍니다.
+    (로컬 점검으로 결론이 난 그룹: 항목 없음·하나뿐·중복, 캐시 적중, 키 없음)
+    """
+    determined = local_result(check_group(goal, parent, children))
+    if determined: return determined
+    if not refresh:
+        hit = cache.get(goal, parent, children)
+        if hit: return hit
+    if not api_keys:
+        return {**EMPTY_RESULT, "grade": "키 없음", "summary": "API 키 없음"}
+    return None
+
+def analyze_ahp_logic(goal, parent, children, api_keys, scheduler=None, cache=None, refresh=False):
+    """
+    그룹 하나를 진단합니다. 같은 목표·기준·하위 항목의 결과가 캐시에 있으면 API를 호출하지 않습니다
+    (refresh=True면 캐시를 건너뛰고 새로 진단해 덮어씁니다).
+    """
+    cache = cache or get_cache()
+    early = _answer_without_api(goal, parent, children, api_keys, cache, refresh)
+    if early: return early
+
+    text, model_name, error = generate(build_prompt(goal, parent, children), api_keys, scheduler)
+    if text is None:
+        return {**EMPTY_RESULT, "detail": error}
+    result = parse_response(text)
+    if result["grade"] != "-":
+        cache.put(goal, parent, children, model_name, result)
+    return result
+
+# ==============================================================================
+# [함수] 여러 그룹 동시 진단
+# ==============================================================================
+def diagnose_concurrently(goal, groups, api_keys, max_workers=8, refresh=False, scheduler=None, cache=None):
+    """
+    groups: [(parent, children), ...] 을 스레드 풀에서 동시에 진단합니다.
+    끝나는 순서대로 (그룹 번호, 결과)를 돌려주므로, 전체 시간은 가장 느린 호출 하나에 가깝습니다.
+    """
+    if not groups: return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+        futures = {pool.submit(analyze_ahp_logic, goal, parent, children, api_keys, scheduler, cache, refresh): idx
+                   for idx, (parent, children) in enumerate(groups)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {**EMPTY_RESULT, "detail": str(e)}
+            yield futures[future], result
+
+def diagnose_streaming(goal, groups, api_keys, max_workers=8, refresh=False, scheduler=None, cache=None):
+    """
+    diagnose_concurrently의 스트리밍 버전. (그룹 번호, 지금까지 확정된 결과, 완료 여부)를 돌려줍니다.
+    작업 스레드는 태그 하나가 확정될 때마다 대기열에 넣고, 호출한 스레드(화면)는 받는 대로 카드를 다시 그립니다.
+    """
+    if not groups: return
+    cache = cache or get_cache()
+    events = queue.Queue()
+
+    def work(idx, parent, children):
+        try:
+            early = _answer_without_api(goal, parent, children, api_keys, cache, refresh)
+            if early:
+                events.put((idx, early, True)); return
+            outcome, parser = {}, TagStreamParser()
+            for chunk in stream_text(build_prompt(goal, parent, children), api_keys, outcome, scheduler):
+                if parser.feed(chunk):
+                    events.put((idx, {"grade": "분석 중...", **parser.fields}, False))
+            if outcome["model"] is None:
+                events.put((idx, {**EMPTY_RESULT, "detail": outcome["error"]}, True)); return
+            result = parser.close()
+            if outcome["error"]:
+                # 도중에 끊긴 응답은 받은 만큼만 보여주고 오류를 알리며, 캐시에 남기지 않습니다.
+                events.put((idx, {**result, "detail": f"응답이 중간에 끊겼습니다: {outcome['error']}"}, True)); return
+            if result["grade"] != "-":
+                cache.put(goal, parent, children, outcome["model"], result)
+            events.put((idx, result, True))
+        except Exception as e:
+            events.put((idx, {**EMPTY_RESULT, "detail": str(e)}, True))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+        for idx, (parent, children) in enumerate(groups):
+            pool.submit(work, idx, parent, children)
+        remaining = len(groups)
+        while remaining:
+            idx, result, done = events.get()
+            remaining -= done
+            yield idx, result, done
+
+# ==============================================================================
+# [함수] 전체 계층 한 번에 진단 (요청 1회, JSON 출력)
+# ==============================================================================
+def build_hierarchy_prompt(goal, groups):
+    tree = "\n".join(
+        f"  - id {idx}: {'1차 평가 기준' if parent == goal else f'상위 기준 {parent!r}의 세부 항목'} → {list(children)} "
+        f"{_precheck_notes(goal, parent, children)}"
+        for idx, (parent, children) in groups)
+    return f"""
+    [분석 대상]
+    - 목표: {goal}
+    - 진단할 그룹 (id: 범위 → 하위 항목):
+{tree}
+
+    [지침 1: 태도]
+    - 주제가 전문적이면 '냉철한 컨설턴트', 일상적이면 '친절한 멘토' 톤.
+    - 1차 평가 기준 그룹은 균형성(MECE)을 중심으로, 세부 항목 그룹은 해당 상위 기준 안에서의 적절성만 진단(다른 기준 언급 금지).
+
+    [지침 2: 형식]
+    - **한국어** 작성, 특수문자(**, *) 사용 금지.
+    - 모든 그룹에 대해 아래 JSON 하나만 출력:
+    {{"groups": [{{"id": 그룹 id, "grade": "적합|보완필요|부적합", "summary": "1줄 요약", "suggestion": "1줄 제안",
+                  "example": ["추천 항목 명사", ...], "detail": ["1. 구성: ...", "2. 위계: ...", "3. 용어: ..."]}}]}}
+    """
+
+def _clean(value):
+    if isinstance(value, (list, tuple)):
+        return "\n".join(str(v) for v in value)
+    return str(value or "-").replace("**", "").replace("*", "").strip() or "-"
+
+def _hierarchy_result(g):
+    """JSON 그룹 객체 하나를 (그룹 id, 결과 dict)로 바꿉니다. id가 없으면 None."""
+    try: idx = int(g["id"])
+    except (KeyError, TypeError, ValueError): return None
+    example = g.get("example") or []
+    if isinstance(example, (list, tuple)):
+        example = "\n".join(f"- {_clean(e)}" for e in example)
+    return idx, {
+        "grade": _clean(g.get("grade")), "summary": _clean(g.get("summary")),
+        "suggestion": _clean(g.get("suggestion")), "example": _clean(example) if example else "",
+        "detail": _clean([_clean(d) for d in g["detail"]] if isinstance(g.get("detail"), list) else g.get("detail")),
+    }
+
+def diagnose_hierarchy(goal, groups, api_keys, scheduler=None, cache=None, refresh=False):
+    """
+    groups: [(parent, children), ...] 전체를 요청 한 번으로 진단하고 (그룹 번호, 결과)를 돌려줍니다.
+    응답을 스트리밍으로 받아, 그룹 객체가 닫히는 즉시 해당 그룹을 내보냅니다.
+    캐시에 있는 그룹과 하위 항목이 없는 그룹은 요청에서 빼며, 응답에서 빠졌거나 JSON을 해석할 수 없는
+    그룹은 diagnose_concurrently로 그룹별 호출을 다시 시도합니다.
+    """
+    cache = cache or get_cache()
+    pending = []
+    for idx, (parent, children) in enumerate(groups):
+        early = _answer_without_api(goal, parent, children, api_keys, cache, refresh)
+        if early: yield idx, early
+        else: pending.append(idx)
+    if not pending: return
+
+    prompt = build_hierarchy_prompt(goal, [(idx, groups[idx]) for idx in pending])
+    outcome, parser, finished = {}, JsonGroupStream(), {}
+    for chunk in stream_text(prompt, api_keys, outcome, scheduler, config={"response_mime_type": "application/json"}):
+        for g in parser.feed(chunk):
+            parsed = _hierarchy_result(g)
+            if not parsed or parsed[0] not in pending or parsed[0] in finished or parsed[1]["grade"] == "-": continue
+            idx, result = parsed
+            finished[idx] = result
+            parent, children = groups[idx]
+            cache.put(goal, parent, children, outcome["model"], result)
+            yield idx, result
+
+    missing = [idx for idx in pending if idx not in finished]
+    if missing and outcome["model"] is None:
+        for idx in missing: yield idx, {**EMPTY_RESULT, "detail": outcome["error"]}
+    elif missing:
+        for k, result in diagnose_concurrently(goal, [groups[idx] for idx in missing], api_keys,
+                                                   refresh=True, scheduler=scheduler, cache=cache):
+            yield missing[k], result
@@ -0,0 +1,126 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from ahp_analysis import (AGGREGATIONS, AnalysisOptions, bootstrap_report, build_report, excel_report, format_report,
+                          summarize_file)
+from sensitivity import crossover_points
+from survey_schema import load_project_schema
+from survey_store import DATA_FOLDER
+
+# ==============================================================================
+# [설정] 일괄 리포트 (브라우저 없이 모든 프로젝트 분석)
+#   python batch_report.py                      → survey_data/*.csv 전체
+#   python batch_report.py a.csv b.csv -j 8     → 지정한 파일만, 프로세스 8개
+# ==============================================================================
+REPORT_FOLDER = os.path.join(DATA_FOLDER, "reports")
+FORMATS = ("xlsx", "csv")
+
+def report_stem(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+# ==============================================================================
+# [함수] 프로젝트 하나 분석 (작업 프로세스에서 실행)
+# ==============================================================================
+def run_project(csv_path, options, out_dir, formats=FORMATS, aggregation="aip", n_boot=1000):
+    """
+    파일 하나를 분석해 리포트를 씁니다. 반환값: 요약 행 dict
+    같은 입력·옵션이면 같은 바이트의 파일이 나오며(부트스트랩도 고정 seed), 임시 파일에 쓴 뒤 교체하므로 중단돼도 이전 리포트가 남습니다.
+    n_boot > 0 이고 AIP 방식이면 엑셀에 신뢰구간·순위 확률 시트를, 대항목이 둘 이상이면 민감도 시트를 덧붙입니다.
+    """
+    bootstrap = bool(n_boot) and aggregation == "aip" and "xlsx" in formats
+    summary = summarize_file(csv_path, options, panel=bootstrap)
+    report_df, main_cr = build_report(summary, load_project_schema(csv_path), aggregation) if summary["n_valid"] else (None, 0.0)
+    row = {"file": os.path.basename(csv_path), "n_total": summary["n_total"], "n_valid": summary["n_valid"],
+           "calibrated": summary["calibrated_count"], "main_cr": round(main_cr, 6), "outputs": ""}
+    if report_df is None:
+        return row
+
+    stem = os.path.join(out_dir, report_stem(csv_path))
+    outputs = []
+    if "xlsx" in formats:
+        intervals, rank_probs = (None, None)
+        if bootstrap:
+            intervals, rank_probs = bootstrap_report(report_df, summary, n_boot=n_boot)
+        crossings, limits = crossover_points(report_df)
+        _write_atomic(stem + ".xlsx", excel_report(format_report(report_df), csv_path, intervals, rank_probs,
+                                                   limits, crossings))
+        outputs.append(stem + ".xlsx")
+    if "csv" in formats:
+        data = report_df.to_csv(index=False, float_format="%.6f", lineterminator="\n").encode("utf-8-sig")
+        _write_atomic(stem + ".csv", data)
+        outputs.append(stem + ".csv")
+    row["outputs"] = ";".join(os.path.basename(p) for p in outputs)
+    return row
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# ==============================================================================
+# [함수] 전체 실행 (프로세스 풀)
+# ==============================================================================
+def run_batch(files, options, out_dir=REPORT_FOLDER, workers=None, formats=FORMATS, aggregation="aip", n_boot=1000,
+              log=print):
+    """
+    파일별 분석을 프로세스 풀에 나눠 실행합니다. 완료 순서와 무관하게 요약표는 파일 이름 순으로 씁니다.
+    반환값: (요약 DataFrame, {파일: 오류 메시지})
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = sorted(files)
+    rows, errors = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_project, path, options, out_dir, formats, aggregation, n_boot): path for path in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                rows[path] = future.result()
+            except Exception as e:
+                errors[path] = f"{type(e).__name__}: {e}"
+                log(f"[{done}/{len(files)}] ❌ {path}: {errors[path]}")
+            else:
+                log(f"[{done}/{len(files)}] ✅ {path} ({rows[path]['n_valid']}/{rows[path]['n_total']}명 유효)")
+
+    index = pd.DataFrame([rows[p] for p in files if p in rows],
+                         columns=["file", "n_total", "n_valid", "calibrated", "main_cr", "outputs"])
+    _write_atomic(os.path.join(out_dir, "_summary.csv"),
+                  index.to_csv(index=False, lineterminator="\n").encode("utf-8-sig"))
+    return index, errors
+
+# ==============================================================================
+# [실행] 명령줄
+# ==============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="survey_data의 프로젝트를 브라우저 없이 일괄 분석해 리포트를 씁니다.")
+    parser.add_argument("files", nargs="*", help="분석할 CSV (기본값: survey_data/*.csv 전체)")
+    parser.add_argument("-o", "--out", default=REPORT_FOLDER, help=f"리포트 폴더 (기본값: {REPORT_FOLDER})")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="프로세스 수 (기본값: CPU 코어 수)")
+    parser.add_argument("--format", choices=["xlsx", "csv", "both"], default="both", help="리포트 형식")
+    defaults = AnalysisOptions()
+    parser.add_argument("--no-calibrate", action="store_true", help="데이터 자동 보정 끄기")
+    parser.add_argument("--cr", type=float, default=defaults.cr_threshold, help="CR 허용 기준")
+    parser.add_argument("--max-scale", type=float, default=defaults.max_scale, help="최대 배수 제한")
+    parser.add_argument("--calibration", choices=["search", "iterative"], default=defaults.calibration, help="보정 방식")
+    parser.add_argument("--method", choices=["eigen", "power", "geometric"], default=defaults.method,
+                        help="가중치 산출 방식")
+    parser.add_argument("--aggregation", choices=list(AGGREGATIONS), default="aip",
+                        help="집단 종합 방식 (aip: 개별 가중치 평균, aij: 판단 기하평균)")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="신뢰구간 재표본 수 (0이면 생략, AIP만)")
+    args = parser.parse_args(argv)
+
+    files = args.files or [os.path.join(DATA_FOLDER, f) for f in os.listdir(DATA_FOLDER) if f.endswith(".csv")]
+    if not files:
+        print("분석할 CSV가 없습니다."); return 0
+    options = AnalysisOptions(not args.no_calibrate, args.cr, args.max_scale, args.calibration, args.method)
+    formats = FORMATS if args.format == "both" else (args.format,)
+    index, errors = run_batch(files, options, args.out, args.workers, formats, args.aggregation, args.bootstrap)
+    print(f"완료: {len(index)}개 성공, {len(errors)}개 실패 → {args.out}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
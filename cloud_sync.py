@@ -0,0 +1,308 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from survey_store import DATA_FOLDER, append_responses, iter_responses_since, project_csv_path
+
+# ==============================================================================
+# [설정] 구글 Apps Script 백업 주소 & 전송 대기열
+# ==============================================================================
+WEBAPP_URL = "https://script.google.com/macros/s/AKfycbw-c1Cf71eSMFaouFhN_YziqOl05KBqZzt4-qOXFwkbFBUQrS4ADMozoIswYdAsQiIIOQ/exec"
+OUTBOX_PATH = os.path.join(DATA_FOLDER, ".cloud_outbox.sqlite3")
+WATERMARK_PATH = os.path.join(DATA_FOLDER, ".cloud_watermarks.json")
+
+# ==============================================================================
+# [클래스] 영속 전송 대기열 (SQLite)
+# ==============================================================================
+class Outbox:
+    """
+    구글 시트로 보낼 응답을 로컬 SQLite에 먼저 기록합니다. 여러 프로세스가 같은 파일을 써도 되며,
+    꺼낸 항목은 lease 시간 동안 다른 작업자가 가져가지 않습니다. max_attempts번 실패하면 'dead'로 보관합니다.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_attempts=8, base_delay=2.0, max_delay=600.0, lease=60.0):
+        self.path = path
+        self.max_attempts, self.base_delay, self.max_delay, self.lease = max_attempts, base_delay, max_delay, lease
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                last_error TEXT,
+                created REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _db(self):
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, payload):
+        now = time.time()
+        with self._db() as conn:
+            conn.execute("INSERT INTO outbox (payload, next_attempt, created) VALUES (?, ?, ?)",
+                         (json.dumps(payload, ensure_ascii=False), now, now))
+
+    def claim(self, limit=20):
+        """전송 시점이 된 항목을 최대 limit개 꺼냅니다. 반환값: [(id, payload dict)]"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, payload FROM outbox WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?",
+                (now, limit)).fetchall()
+            if rows:
+                conn.executemany("UPDATE outbox SET next_attempt = ? WHERE id = ?",
+                                 [(now + self.lease, r[0]) for r in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK"); raise
+        finally:
+            conn.close()
+        return [(r[0], json.loads(r[1])) for r in rows]
+
+    def mark_sent(self, ids):
+        if not ids: return
+        with self._db() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def mark_failed(self, item_id, error):
+        """지수 백오프(+지터)로 다음 시도 시각을 미룹니다."""
+        with self._db() as conn:
+            row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (item_id,)).fetchone()
+            if row is None: return
+            attempts = row[0] + 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            status = "dead" if attempts >= self.max_attempts else "pending"
+            conn.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ?, status = ? WHERE id = ?",
+                         (attempts, time.time() + delay, str(error)[:500], status, item_id))
+
+    def retry_dead(self):
+        with self._db() as conn:
+            conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ? WHERE status = 'dead'",
+                         (time.time(),))
+
+    def stats(self):
+        with self._db() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            failing = conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND attempts > 0").fetchone()[0]
+            oldest = conn.execute("SELECT MIN(created) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        return {"pending": counts.get("pending", 0), "retrying": failing, "dead": counts.get("dead", 0),
+                "oldest_age": (time.time() - oldest) if oldest else 0.0}
+
+# ==============================================================================
+# [클래스] 백그라운드 전송 작업자
+# ==============================================================================
+class OutboxWorker:
+    """
+    대기열을 비우는 데몬 스레드. 연결을 재사용하는 requests.Session으로 batch_size개씩 전송하고,
+    실패한 항목은 Outbox의 백오프 규칙에 따라 다시 시도합니다. url을 바꾸면 로컬 테스트 서버로도 검증할 수 있습니다.
+    """
+
+    def __init__(self, outbox, url=WEBAPP_URL, batch_size=20, timeout=10, idle_wait=5.0):
+        self.outbox, self.url, self.batch_size, self.timeout, self.idle_wait = outbox, url, batch_size, timeout, idle_wait
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount("https://", adapter); self.session.mount("http://", adapter)
+        self.counters = {"sent": 0, "failed": 0, "last_error": "", "last_success": None}
+        self._wake, self._stop = threading.Event(), threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cloud-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set(); self._wake.set()
+        if self._thread: self._thread.join(timeout)
+
+    def notify(self):
+        """새 항목이 들어왔음을 알려 대기 없이 바로 전송하게 합니다."""
+        self._wake.set()
+
+    def drain_once(self):
+        """한 묶음을 전송합니다. 반환값: 이번에 꺼낸 항목 수"""
+        batch = self.outbox.claim(self.batch_size)
+        sent = []
+        for item_id, payload in batch:
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                response.raise_for_status()
+                sent.append(item_id)
+            except Exception as e:
+                self.outbox.mark_failed(item_id, e)
+                self.counters["failed"] += 1
+                self.counters["last_error"] = str(e)[:200]
+        self.outbox.mark_sent(sent)
+        if sent:
+            self.counters["sent"] += len(sent)
+            self.counters["last_success"] = time.time()
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                claimed = self.drain_once()
+            except Exception as e:
+                self.counters["last_error"] = str(e)[:200]
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wake.wait(self.idle_wait)
+
+    def stats(self):
+        return {**self.outbox.stats(), **self.counters}
+
+# ==============================================================================
+# [함수] 제출 경로에서 사용하는 진입점
+# ==============================================================================
+def enqueue_backup(worker, user_key, goal_name, respondent, raw_data):
+    """응답을 로컬 대기열에 기록만 하고 바로 반환합니다 (전송은 백그라운드 작업자가 담당)."""
+    worker.outbox.enqueue({
+        "user_key": user_key,
+        "project_name": goal_name,
+        "respondent": respondent,
+        "raw_data": raw_data
+    })
+    worker.notify()
+
+# ==============================================================================
+# [함수] 클라우드 복구: 페이지 단위 조회 + 워터마크 이후 행만 로컬에 병합
+# ==============================================================================
+def _row_fingerprint(row):
+    return (str(row.get("Time", "")), str(row.get("Respondent", "")), str(row.get("Raw_Data", "")))
+
+def _row_content(row):
+    """로컬 행과 클라우드 행을 맞춰 보는 키. 클라우드의 Time은 Apps Script가 기록한 시각이라 로컬 Time과 다르므로 제외합니다."""
+    return (str(row.get("Respondent", "")), str(row.get("Raw_Data", "")))
+
+def _local_contents(path):
+    """로컬 프로젝트 파일의 (Respondent, Raw_Data)별 행 수 (청크 단위로 셈)."""
+    counts = Counter()
+    if os.path.exists(path):
+        # 문자열 그대로 읽어야 "007" 같은 이름이 숫자(7)로 바뀌지 않고 클라우드 행과 맞습니다.
+        for chunk in iter_responses_since(path, dtype=str, keep_default_na=False)[1]:
+            counts.update(zip(chunk.get("Respondent", []), chunk.get("Raw_Data", [])))
+    return counts
+
+def _row_project(row):
+    for k in ("Project", "project_name", "Project_Name", "project"):
+        if row.get(k): return str(row[k])
+    return "cloud_restore"
+
+_KOREAN_TIME = re.compile(r"(\d{4})\.\s*(\d{1,2})\.\s*(\d{1,2})\.?\s*(오전|오후)?\s*(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
+def _parse_time(value):
+    """시트의 Time 값(ISO, "2024-01-05 15:04", "2024. 1. 5. 오후 3:04:05" 등)을 비교 가능한 시각으로 바꿉니다. 해석할 수 없으면 None."""
+    text = str(value or "").strip()
+    match = _KOREAN_TIME.fullmatch(text)
+    if match:
+        y, mo, d, ampm, h, mi, sec = match.groups()
+        h = int(h) % 12 + (12 if ampm == "오후" else 0) if ampm else int(h)
+        return pd.Timestamp(int(y), int(mo), int(d), h, int(mi), int(sec or 0))
+    stamp = pd.to_datetime(text, errors="coerce")
+    if pd.isna(stamp): return None
+    return stamp.tz_convert("UTC").tz_localize(None) if stamp.tzinfo else stamp
+
+def _load_watermarks():
+    try:
+        with open(WATERMARK_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_watermarks(marks):
+    tmp = WATERMARK_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(marks, f, ensure_ascii=False)
+    os.replace(tmp, WATERMARK_PATH)
+
+def reset_watermark(user_key):
+    """다음 복구 때 처음부터 다시 가져오도록 워터마크를 지웁니다 (로컬 파일 삭제 후 등)."""
+    marks = _load_watermarks()
+    if marks.pop(user_key, None) is not None:
+        _save_watermarks(marks)
+
+def fetch_cloud_pages(user_key, since=None, page_size=500, url=WEBAPP_URL, session=None, timeout=30):
+    """
+    user_key의 백업 행을 페이지 단위로 가져옵니다 (since: 이 시각 이후 행만 요청).
+    서버가 limit/offset을 지원하지 않아 전체를 한 번에 돌려주더라도, 새 행이 없는 페이지에서 멈춥니다.
+    """
+    session = session or requests.Session()
+    offset, seen = 0, set()
+    while True:
+        params = {"user_key": user_key, "limit": page_size, "offset": offset}
+        if since: params["since"] = since
+        response = session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        rows = (data.get("rows") or []) if isinstance(data, dict) else (data or [])
+        fresh = [r for r in rows if _row_fingerprint(r) not in seen]
+        if not fresh: break
+        seen.update(_row_fingerprint(r) for r in fresh)
+        yield fresh
+        has_more = data.get("has_more") if isinstance(data, dict) else None
+        if has_more is False or (has_more is None and len(rows) < page_size): break
+        offset += len(rows)
+
+def restore_from_cloud(user_key, page_size=500, url=WEBAPP_URL, progress=None):
+    """
+    마지막 복구 이후(워터마크) 클라우드에 추가된 행만 가져와 로컬 프로젝트 CSV에 중복 없이 추가합니다.
+    클라우드 행은 같은 (Respondent, Raw_Data)의 로컬 행과 하나씩 짝지어 지우고 남는 것만 추가하므로,
+    이미 로컬에 있는 제출은 다시 들어가지 않고, 같은 내용의 제출이 여러 번 있었으면 그 횟수만큼 유지됩니다.
+    이후 결과 센터는 로컬 파일만 읽습니다. 반환값: {프로젝트 파일 경로: 새로 추가된 행 수}
+    """
+    marks = _load_watermarks()
+    since = marks.get(user_key)
+    added, known, newest = {}, {}, since
+    newest_at = _parse_time(since) if since else None
+    for page in fetch_cloud_pages(user_key, since=since, page_size=page_size, url=url):
+        by_project = {}
+        for row in page:
+            by_project.setdefault(project_csv_path(user_key, _row_project(row)), []).append(row)
+        for path, rows in by_project.items():
+            if path not in known:
+                known[path] = _local_contents(path)
+            new_rows = []
+            for row in rows:
+                key = _row_content(row)
+                if known[path][key] > 0:
+                    known[path][key] -= 1
+                    continue
+                new_rows.append({"Time": str(row.get("Time", "")), "Respondent": key[0], "Raw_Data": key[1]})
+            append_responses(path, new_rows)
+            added[path] = added.get(path, 0) + len(new_rows)
+        # 워터마크는 시각으로 비교하고, 서버에는 시트에 기록된 원래 문자열 그대로 보냅니다.
+        for r in page:
+            stamp = _parse_time(r.get("Time"))
+            if stamp is not None and (newest_at is None or stamp > newest_at):
+                newest, newest_at = str(r.get("Time")), stamp
+        if progress: progress(sum(added.values()))
+    if newest and newest != since:
+        marks[user_key] = newest
+        _save_watermarks(marks)
+    return added
@@ -0,0 +1,363 @@
+let currentTaskIdx = 0, items = [], pairs = [], matrix = [], pairIdx = 0, initialRanks = [];
+let answers = {};  // "과제번호:r:c" → 값. 완료 시 압축 형식으로 Streamlit에 전달합니다.
+let currentPairSwapped = false; 
+
+function loadTask() {
+    if (currentTaskIdx >= tasks.length) { finishAll(); return; }
+    const task = tasks[currentTaskIdx]; items = task.items;
+    // 순위를 다시 정하면 묻는 쌍이 달라질 수 있으므로, 이 과제의 이전 응답은 지웁니다.
+    Object.keys(answers).forEach(k => { if (k.startsWith(currentTaskIdx + ":")) delete answers[k]; });
+    document.getElementById('task-title').innerText = task.name;
+    const listDiv = document.getElementById('ranking-list'); listDiv.innerHTML = "";
+    let options = '<option value="" selected disabled>선택</option>';
+    for(let i=1; i<=items.length; i++) options += `<option value="${i}">${i}위</option>`;
+    items.forEach((item, idx) => {
+        listDiv.innerHTML += `<div style="display:flex; justify-content:space-between; padding:14px; background:#f8f9fa; border-radius:10px; margin-bottom:10px; align-items:center; border:1px solid #eee;">
+            <span style="font-weight:bold;">${item}</span><select id="rank-${idx}">${options}</select></div>`;
+    });
+    showStep('step-ranking'); document.getElementById('live-board').style.display = 'none';
+}
+
+function startCompare() {
+    initialRanks = []; let tempIdxMap = [];
+    for(let i=0; i<items.length; i++) {
+        const el = document.getElementById('rank-'+i);
+        if(!el.value) { alert("순위를 모두 정해주세요."); return; }
+        initialRanks[i] = parseInt(el.value);
+        tempIdxMap.push({ name: items[i], rank: initialRanks[i], originIdx: i });
+    }
+    if(new Set(initialRanks).size !== initialRanks.length) { alert("중복 순위가 있습니다."); return; }
+
+    tempIdxMap.sort((a, b) => a.rank - b.rank);
+    pairs = [];
+    // 질문 축소 모드: 순위가 인접한 쌍(i, i+1)과 한 칸 건너뛴 쌍(i, i+2)만 묻습니다 (2n-3문항, 일관성 점검용 순환 포함).
+    const reduced = isReducedTask();
+    for(let i=0; i<tempIdxMap.length; i++) {
+        for(let j=i+1; j<tempIdxMap.length; j++) {
+            if (reduced && j - i > 2) continue;
+            pairs.push({ 
+                r: tempIdxMap[i].originIdx, c: tempIdxMap[j].originIdx, 
+                a: tempIdxMap[i].name, b: tempIdxMap[j].name 
+            });
+        }
+    }
+    const n = items.length; matrix = Array.from({length: n}, () => Array(n).fill(0));
+    for(let i=0; i<n; i++) matrix[i][i] = 1;
+    pairIdx = 0; showStep('step-compare'); renderPair();
+}
+
+function renderPair() {
+    const p = pairs[pairIdx];
+
+    let savedWeight = matrix[p.r][p.c];
+    let initialSliderVal = 0;
+
+    if (savedWeight !== 0 && savedWeight !== 1) {
+        if (savedWeight > 1) initialSliderVal = -(Math.round(savedWeight) - 1); 
+        else initialSliderVal = Math.round(1/savedWeight) - 1; 
+    }
+
+    let weights = calculateWeights(initialSliderVal); 
+    const EPSILON = 0.00001;
+
+    currentPairSwapped = false;
+    if (pairIdx > 0 && weights[p.c] > weights[p.r] + EPSILON) {
+        currentPairSwapped = true;
+    }
+
+    let leftName = currentPairSwapped ? p.b : p.a;
+    let rightName = currentPairSwapped ? p.a : p.b;
+    let leftRankHint = currentPairSwapped ? initialRanks[p.c] : initialRanks[p.r];
+    let rightRankHint = currentPairSwapped ? initialRanks[p.r] : initialRanks[p.c];
+
+    document.getElementById('item-a').innerText = leftName; 
+    document.getElementById('item-b').innerText = rightName;
+    document.getElementById('hint-a').innerText = leftRankHint;
+    document.getElementById('hint-b').innerText = rightRankHint;
+
+    let displayVal = currentPairSwapped ? (initialSliderVal * -1) : initialSliderVal;
+    document.getElementById('slider').value = displayVal;
+
+    const btnArea = document.getElementById('btn-area');
+    if (pairIdx === 0) {
+        btnArea.innerHTML = `
+            <button class="btn btn-reset" onclick="resetTask()">🔄 순위 변경</button>
+            <button class="btn" onclick="checkLogic()">다음 질문 ➡</button>
+        `;
+    } else {
+        btnArea.innerHTML = `
+            <button class="btn btn-secondary" onclick="goBack()">⬅ 이전 질문</button>
+            <button class="btn" onclick="checkLogic()">다음 질문 ➡</button>
+        `;
+    }
+
+    document.getElementById('live-board').style.display = 'block';
+    updateUI(false);
+}
+
+function updateUI(checkAlert = false) {
+    const slider = document.getElementById('slider');
+    let val = parseInt(slider.value);
+    let leftName = document.getElementById('item-a').innerText;
+
+    if (checkAlert && val > 0) {
+        if (pairIdx === 0) {
+             alert(`🚫 [논리 보호]\n\n설정하신 순위에 따라 '${leftName}' 항목이 더 중요합니다.\n따라서 점수도 '${leftName}' 쪽(왼쪽)으로만 줄 수 있습니다.`);
+             slider.value = 0; val = 0;
+        } else {
+            alert(`🚫 [논리 보호]\n\n현재 데이터 상 '${leftName}' 항목이 더 중요합니다.\n따라서 점수도 '${leftName}' 쪽(왼쪽)으로만 줄 수 있습니다.`);
+            slider.value = 0; val = 0;
+        }
+    }
+
+    const disp = document.getElementById('val-display');
+    let perc = (val + 4) * 12.5;
+
+    if(val < 0) slider.style.background = `linear-gradient(to right, #dee2e6 0%, #dee2e6 ${perc}%, #228be6 ${perc}%, #228be6 50%, #dee2e6 50%, #dee2e6 100%)`;
+    else if(val > 0) slider.style.background = `linear-gradient(to right, #dee2e6 0%, #dee2e6 50%, #fa5252 50%, #fa5252 ${perc}%, #dee2e6 ${perc}%, #dee2e6 100%)`;
+    else slider.style.background = '#dee2e6';
+
+    let rightName = document.getElementById('item-b').innerText;
+    if(val == 0) disp.innerText = "동등함 (1:1)";
+    else if(val < 0) disp.innerText = `${leftName} ${Math.abs(val)+1}배 중요`;
+    else disp.innerText = `${rightName} ${Math.abs(val)+1}배 중요`; 
+
+    updateBoard();
+}
+
+function updateBoard() {
+    const grid = document.getElementById('board-grid'); 
+    grid.innerHTML = "";
+    const pill = document.getElementById('status-pill');
+
+    let weights = calculateWeights(); 
+    const EPSILON = 0.00001;
+
+    let indexedWeights = weights.map((w, i) => ({w, i}));
+    indexedWeights.sort((a,b) => {
+        if (Math.abs(b.w - a.w) > EPSILON) return b.w - a.w;
+        return initialRanks[a.i] - initialRanks[b.i];
+    });
+
+    let rankMap = {};
+    indexedWeights.forEach((obj, idx) => rankMap[obj.i] = idx + 1);
+
+    let flippedIndices = new Set();
+    if (pairIdx > 0) {
+        for(let i=0; i<items.length; i++) {
+            for(let j=0; j<items.length; j++) {
+                if(i === j) continue;
+                if (initialRanks[i] < initialRanks[j] && rankMap[i] > rankMap[j]) {
+                    flippedIndices.add(i); flippedIndices.add(j);
+                }
+            }
+        }
+    }
+
+    let hasFlip = (flippedIndices.size > 0);
+
+    if (pairIdx === 0) {
+        pill.innerText = "✅ 순위 설정 완료"; pill.style.background = "#ebfbee"; pill.style.color = "#2f9e44";
+    } else if (hasFlip) {
+        pill.innerText = "⚠️ 순위 역전 감지"; pill.style.background = "#fff5f5"; pill.style.color = "#fa5252";
+    } else {
+        pill.innerText = "✅ 논리 일치"; pill.style.background = "#ebfbee"; pill.style.color = "#2f9e44";
+    }
+
+    let fixedOrder = items.map((name, i) => ({name, org: initialRanks[i], idx: i}))
+                            .sort((a,b) => a.org - b.org);
+
+    fixedOrder.forEach(item => {
+        let isFlipped = flippedIndices.has(item.idx);
+        let curRank = (pairIdx === 0) ? item.org : rankMap[item.idx];
+
+        let borderStyle = isFlipped ? "2px solid #fa5252 !important" : "1px solid #dee2e6";
+        let bgStyle = isFlipped ? "#fff5f5 !important" : "white";
+        let textColorClass = isFlipped ? "error-text" : "match-text";
+        let shadow = isFlipped ? "box-shadow: 0 4px 12px rgba(250, 82, 82, 0.15);" : "";
+
+        let currentRankHtml = "";
+        if (pairIdx > 0) {
+            currentRankHtml = `<div class="rank-row"><span>현재:</span><span class="rank-val ${textColorClass}">${curRank}위</span></div>`;
+        }
+
+        grid.innerHTML += `
+        <div class="board-item" style="border: ${borderStyle}; background-color: ${bgStyle}; ${shadow}">
+            <span class="item-name">${item.name}</span>
+            <div class="rank-row"><span>기존:</span><span class="rank-val">${item.org}위</span></div>
+            ${currentRankHtml}
+        </div>`;
+    });
+}
+
+function calculateWeights(tempVal = null) {
+    const n = items.length; 
+    let tempMatrix = matrix.map(row => [...row]);
+    let p = pairs[pairIdx];
+
+    let val = tempVal !== null ? tempVal : parseInt(document.getElementById('slider').value);
+
+    if (currentPairSwapped && tempVal === null) {
+        val = val * -1;
+    }
+
+    let w_abs = Math.abs(val) + 1;
+    let w_final = (val <= 0) ? w_abs : (1 / w_abs);
+
+    tempMatrix[p.r][p.c] = w_final; 
+    tempMatrix[p.c][p.r] = 1 / w_final;
+
+    if (isReducedTask()) return llsmWeights(tempMatrix);
+    for(let i=0; i<n; i++) { for(let j=0; j<n; j++) { if(tempMatrix[i][j] === 0) tempMatrix[i][j] = 1; } }
+    let weights = tempMatrix.map(row => Math.pow(row.reduce((a, b) => a * b, 1), 1/n));
+    let sum = weights.reduce((a, b) => a + b, 0);
+    return weights.map(v => v / sum);
+}
+
+function isReducedTask() { return !!(tasks[currentTaskIdx] && tasks[currentTaskIdx].reduced); }
+
+// 불완전 비교 행렬(0 = 아직 묻지 않은 쌍)의 로그 최소제곱 가중치.
+// 모든 쌍이 있으면 행 기하평균과 같고, 아직 연결되지 않은 항목은 작은 정규화 항 때문에 동등하게 취급됩니다.
+function llsmWeights(m) {
+    const n = m.length, EPS = 1e-6;
+    let A = Array.from({length: n}, () => Array(n).fill(1)), b = Array(n).fill(0);
+    for(let i=0; i<n; i++) {
+        for(let j=0; j<n; j++) {
+            if(i === j) continue;
+            A[i][i] += EPS; A[i][j] -= EPS;
+            if(m[i][j] > 0) { A[i][i] += 1; A[i][j] -= 1; b[i] += Math.log(m[i][j]); }
+        }
+    }
+    for(let c=0; c<n; c++) {
+        let piv = c;
+        for(let r=c+1; r<n; r++) if(Math.abs(A[r][c]) > Math.abs(A[piv][c])) piv = r;
+        [A[c], A[piv]] = [A[piv], A[c]]; [b[c], b[piv]] = [b[piv], b[c]];
+        for(let r=c+1; r<n; r++) {
+            const f = A[r][c] / A[c][c];
+            for(let k=c; k<n; k++) A[r][k] -= f * A[c][k];
+            b[r] -= f * b[c];
+        }
+    }
+    let x = Array(n).fill(0);
+    for(let r=n-1; r>=0; r--) {
+        let acc = b[r];
+        for(let k=r+1; k<n; k++) acc -= A[r][k] * x[k];
+        x[r] = acc / A[r][r];
+    }
+    let weights = x.map(v => Math.exp(v));
+    let sum = weights.reduce((a, c) => a + c, 0);
+    return weights.map(v => v / sum);
+}
+
+function checkLogic() {
+    if (pairIdx === 0) { saveAndNext(); return; }
+    const sliderVal = parseInt(document.getElementById('slider').value);
+
+    let weights = calculateWeights(sliderVal);
+    const EPSILON = 0.00001;
+    let indexedWeights = weights.map((w, i) => ({w, i})).sort((a,b) => {
+        if (Math.abs(b.w - a.w) > EPSILON) return b.w - a.w;
+        return initialRanks[a.i] - initialRanks[b.i];
+    });
+    let rankMap = {};
+    indexedWeights.forEach((obj, idx) => rankMap[obj.i] = idx + 1);
+
+    let flippedPairs = [];
+    for(let i=0; i<items.length; i++) {
+        for(let j=0; j<items.length; j++) {
+            if(i === j) continue;
+            if(initialRanks[i] < initialRanks[j] && rankMap[i] > rankMap[j]) {
+                flippedPairs.push(`${items[i]} (기존 ${initialRanks[i]}위) ↔ ${items[j]} (기존 ${initialRanks[j]}위)`);
+            }
+        }
+    }
+
+    if (flippedPairs.length > 0) { 
+        const listDiv = document.getElementById('flip-details');
+        listDiv.innerHTML = "";
+        [...new Set(flippedPairs)].forEach(txt => {
+            listDiv.innerHTML += `<div class="flip-item">❌ ${(txt)}</div>`;
+        });
+        document.getElementById('modal-flip').style.display = 'flex'; 
+        return; 
+    }
+
+    saveAndNext();
+}
+
+function closeModal(type, action) {
+    document.getElementById('modal-' + type).style.display = 'none';
+    if (type === 'flip') {
+        if(action === 'updaterank') {
+            let weights = calculateWeights();
+            let sortedIdx = weights.map((w, i) => i).sort((a, b) => weights[b] - weights[a]);
+            sortedIdx.forEach((idx, i) => { initialRanks[idx] = i + 1; });
+            saveAndNext();
+        } else {
+            document.getElementById('slider').value = 0; updateUI();
+        }
+    }
+}
+
+function resetTask() {
+    if(confirm("순위 설정 화면으로 돌아가시겠습니까?\n(입력한 내용은 초기화됩니다)")) { 
+        loadTask(); 
+    }
+}
+
+function goBack() { if (pairIdx > 0) { pairIdx--; renderPair(); } }
+
+function saveAndNext() {
+    const slider = document.getElementById('slider');
+    let val = parseInt(slider.value);
+
+    if (currentPairSwapped) {
+        val = val * -1;
+    }
+
+    let w_abs = Math.abs(val) + 1;
+    let w_final = (val <= 0) ? w_abs : (1 / w_abs);
+
+    const p = pairs[pairIdx];
+    matrix[p.r][p.c] = w_final; matrix[p.c][p.r] = 1/w_final;
+
+    answers[`${currentTaskIdx}:${p.r}:${p.c}`] = Number(w_final.toFixed(2));
+
+    pairIdx++;
+    if (pairIdx >= pairs.length) { currentTaskIdx++; loadTask(); }
+    else { renderPair(); }
+}
+
+function finishAll() {
+    showStep('step-finish'); document.getElementById('live-board').style.display = 'none';
+    // 압축 형식: {id, answers: [[과제번호, 항목 r, 항목 c, 값], ...]} (항목 번호는 tasks[i].items 기준)
+    const rows = Object.entries(answers).map(([k, v]) => k.split(":").map(Number).concat([v]));
+    const submissionId = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
+    sendToStreamlit("streamlit:setComponentValue", { value: { id: submissionId, answers: rows }, dataType: "json" });
+}
+
+function showStep(id) { document.querySelectorAll('.step').forEach(e => e.classList.remove('active')); document.getElementById(id).classList.add('active'); }
+
+// ==============================================================================
+// Streamlit 컴포넌트 연결 (빌드 도구 없이 postMessage 프로토콜을 직접 사용)
+//   - 이 파일과 CSS는 브라우저 캐시에 남고, 다시 실행될 때마다 바뀌는 것은 args.tasks 뿐입니다.
+// ==============================================================================
+const FRAME_HEIGHT = 850;
+let tasks = [], tasksKey = null;
+
+function sendToStreamlit(type, data) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), "*");
+}
+
+window.addEventListener("message", (event) => {
+    if (!event.data || event.data.type !== "streamlit:render") return;
+    const nextTasks = (event.data.args && event.data.args.tasks) || [];
+    const nextKey = JSON.stringify(nextTasks);
+    if (nextKey === tasksKey) return;  // 같은 설문의 재실행이면 진행 상태를 유지합니다.
+    tasks = nextTasks; tasksKey = nextKey;
+    currentTaskIdx = 0; answers = {};
+    loadTask();
+});
+
+sendToStreamlit("streamlit:componentReady", { apiVersion: 1 });
+sendToStreamlit("streamlit:setFrameHeight", { height: FRAME_HEIGHT });
@@ -1,8 +1,6 @@
 import streamlit as st
-import google.generativeai as genai
-import re
-import time
-import random
+from ai_diagnosis import SCHEDULER, diagnose_hierarchy, diagnose_streaming
+from structure_check import check_group
 
 # --------------------------------------------------------------------------
 # 1. 페이지 설정
@@ -28,98 +26,7 @@ if not API_KEYS:
             API_KEYS = [k.strip() for k in user_input.replace(',', '\n').split('\n') if k.strip()]
 
 # --------------------------------------------------------------------------
-# 3. AI 분석 함수
-# --------------------------------------------------------------------------
-def analyze_ahp_logic(goal, parent, children):
-    empty_res = {"grade": "오류", "summary": "분석 실패", "suggestion": "잠시 후 시도", "example": "", "detail": "API 호출량 초과"}
-
-    if not children:
-        return {**empty_res, "grade": "정보없음", "summary": "하위 항목 없음"}
-    
-    if not API_KEYS:
-        return {**empty_res, "grade": "키 없음", "summary": "API 키 없음"}
-    
-    is_main = (goal == parent)
-    scope_guide = "1차 평가 기준의 균형성(MECE)을 중심으로 진단." if is_main else f"상위 기준 '{parent}'의 하위 세부 항목 적절성만 진단(다른 기준 언급 금지)."
-
-    models = [
-        'gemini-2.5-flash-lite', 
-        'gemini-2.0-flash-lite-preview-02-05', 
-        'gemini-2.5-flash', 
-        'gemini-2.0-flash', 
-        'gemini-2.0-pro-exp-02-05'
-    ]
-    
-    prompt = f"""
-    [분석 대상]
-    - 목표: {goal}
-    - 기준: {parent}
-    - 하위: {children}
-    
-    [지침 1: 태도]
-    - 주제가 전문적이면 '냉철한 컨설턴트', 일상적이면 '친절한 멘토' 톤.
-    - {scope_guide}
-    
-    [지침 2: 형식]
-    - **한국어** 작성.
-    - **특수문자(**, *) 사용 금지.**
-    - [EXAMPLE]은 설명 없이 **추천 항목 명사**만 나열.
-    
-    [출력 포맷]
-    [GRADE] 적합/보완필요/부적합
-    [SUMMARY] (1줄 요약)
-    [SUGGESTION] (1줄 제안)
-    [EXAMPLE]
-    - 항목1
-    - 항목2
-    - 항목3
-    [DETAIL]
-    1. 구성: (내용)
-    2. 위계: (내용)
-    3. 용어: (내용)
-    """
-    
-    attempts = []
-    for model in models:
-        shuffled_keys = API_KEYS.copy()
-        random.shuffle(shuffled_keys)
-        for key in shuffled_keys:
-            attempts.append((key, model))
-            
-    last_error = ""
-    
-    for i, (key, model_name) in enumerate(attempts):
-        try:
-            genai.configure(api_key=key)
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt)
-            text = response.text
-            
-            def extract(tag, t):
-                match = re.search(fr"\[{tag}\](.*?)(?=\[|$)", t, re.DOTALL | re.IGNORECASE)
-                if match:
-                    c = match.group(1).strip()
-                    c = c.replace("**", "").replace("*", "") 
-                    return re.sub(r"^[\s\:\-]]+|[\s\]\:\-]+$", "", c).strip()
-                return "-"
-
-            return {
-                "grade": extract("GRADE", text),
-                "summary": extract("SUMMARY", text),
-                "suggestion": extract("SUGGESTION", text),
-                "example": extract("EXAMPLE", text),
-                "detail": extract("DETAIL", text)
-            }
-
-        except Exception as e:
-            last_error = str(e)
-            time.sleep(0.2)
-            continue
-
-    return {**empty_res, "detail": f"모든 키와 모델이 한도 초과입니다. (Last: {last_error})"}
-
-# --------------------------------------------------------------------------
-# 4. UI 렌더링 함수
+# 3. UI 렌더링 함수
 # --------------------------------------------------------------------------
 def render_result_ui(title, data, count_msg=""):
     grade = data.get('grade', '정보없음').replace("[", "").replace("]", "").strip()
@@ -158,7 +65,7 @@ def render_result_ui(title, data, count_msg=""):
             st.write(cl)
 
 # --------------------------------------------------------------------------
-# 5. 메인 로직
+# 4. 메인 로직
 # --------------------------------------------------------------------------
 if 'main_count' not in st.session_state: st.session_state.main_count = 1 
 if 'sub_counts' not in st.session_state: st.session_state.sub_counts = {}
@@ -168,6 +75,12 @@ st.title("1️⃣ 연구 설계 및 AI 진단")
 # [수정됨] 깔끔한 상태 표시
 if API_KEYS:
     st.caption(f"✅ {len(API_KEYS)}개의 API 키가 활성화되었습니다.")
+    api_stats = SCHEDULER.stats()
+    if api_stats["calls"]:
+        with st.sidebar.expander("📈 API 사용 현황"):
+            st.caption(f"성공 {api_stats['successes']} · 실패 {api_stats['failures']} "
+                       f"(한도 초과 {api_stats['quota_errors']}) · 전환에 쓴 시간 {api_stats['failover_seconds']:.1f}초")
+            st.dataframe(api_stats["pairs"], hide_index=True, use_container_width=True)
 
 goal = st.text_input("🎯 최종 목표", placeholder="예: 차세대 전투기 도입 / 점심 메뉴 선정")
 
@@ -198,33 +111,52 @@ if goal:
                 struct[c] = subs
 
         st.divider()
+        batch_mode = st.radio("진단 방식", ["📦 전체 한 번에 (요청 1회)", "🧵 그룹별 동시 요청 (실시간 표시)"], horizontal=True,
+                              help="무료 키는 요청 수 한도가 빡빡하므로 기본값은 전체 계층을 한 번의 요청으로 진단합니다.") \
+            .startswith("📦")
+        refresh = st.checkbox("♻️ 저장된 진단 결과 무시하고 다시 진단", value=False,
+                              help="같은 목표·기준·하위 항목의 이전 진단 결과가 있으면 API를 호출하지 않고 바로 보여줍니다.")
         if st.button("🚀 AI 진단 시작", type="primary"):
             if not API_KEYS:
                 st.error("API 키가 없습니다!")
             else:
-                total_steps = 1 + len(struct)
+                # 1차 기준 + 각 세부 그룹을 동시에 진단하고, 끝나는 대로 제자리에 결과 카드를 채웁니다.
+                # 로컬 구조 점검(중복·유사 항목, 상위 기준 반복, 항목 수)은 API 호출 전에 바로 표시합니다.
+                groups = []
+                for p, ch, title in [(goal, main, f"1차 기준: {goal}")] + [(p, ch, f"세부항목: {p}") for p, ch in struct.items()]:
+                    warnings = [i["message"] for i in check_group(goal, p, ch) if i["level"] == "warning"]
+                    groups.append((p, ch, title, " · ".join(f"⚠️ {w}" for w in warnings)))
+                total_steps = len(groups)
                 progress_bar = st.progress(0)
                 status_text = st.empty()
-                
-                status_text.text("🧠 1차 기준 분석 중...")
-                res = analyze_ahp_logic(goal, goal, main)
-                render_result_ui(f"1차 기준: {goal}", res)
-                
-                progress_bar.progress(1/total_steps)
-                time.sleep(2)
-                
-                current_step = 2
-                for p, ch in struct.items():
-                    status_text.text(f"🧠 '{p}' 분석 중...")
-                    msg = "⚠️ 항목 과다" if len(ch) >= 8 else ""
-                    res = analyze_ahp_logic(goal, p, ch)
-                    render_result_ui(f"세부항목: {p}", res, msg)
-                    
-                    progress_bar.progress(current_step/total_steps)
-                    time.sleep(2)
-                    current_step += 1
-                
-                status_text.success("✅ 분석 완료!")
+                status_text.text(f"🧠 {total_steps}개 그룹 {'한 번에' if batch_mode else '동시'} 분석 중...")
+
+                slots = []
+                for parent, _, title, _ in groups:
+                    slot = st.empty()
+                    slot.info(f"🧠 '{parent}' 분석 중...")
+                    slots.append(slot)
+
+                done, cached, local = 0, 0, 0
+                # 그룹별 모드는 태그가 확정될 때마다(완료 전에도) 카드를 다시 그립니다.
+                targets = [(g[0], g[1]) for g in groups]
+                if batch_mode:
+                    events = ((idx, res, True) for idx, res in diagnose_hierarchy(goal, targets, API_KEYS, refresh=refresh))
+                else:
+                    events = diagnose_streaming(goal, targets, API_KEYS, refresh=refresh)
+                for idx, res, finished in events:
+                    _, _, title, msg = groups[idx]
+                    with slots[idx].container():
+                        render_result_ui(title, res, msg)
+                    if not finished: continue
+                    done += 1
+                    cached += bool(res.get("cached"))
+                    local += bool(res.get("local"))
+                    progress_bar.progress(done/total_steps)
+                    status_text.text(f"🧠 {done}/{total_steps} 그룹 완료")
+
+                notes = [f"저장된 결과 {cached}개 재사용"] * bool(cached) + [f"로컬 점검으로 {local}개 판정"] * bool(local)
+                status_text.success("✅ 분석 완료!" + (f" ({', '.join(notes)})" if notes else ""))
                 progress_bar.progress(1.0)
 
         st.divider()
@@ -1,11 +1,13 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import json
-import pandas as pd
 from datetime import datetime
 import os
 import uuid 
-import requests  # [추가] 구글 전송을 위한 라이브러리
+from ahp_analysis import compute_metrics
+from cloud_sync import Outbox, OutboxWorker, enqueue_backup
+from survey_schema import CONFIG_DIR, REDUCED_MIN_ITEMS, answer_key, build_tasks
+from survey_store import append_response, project_csv_path
 
 # ==============================================================================
 # [설정] 본인의 실제 배포 주소 입력
@@ -13,26 +15,59 @@ import requests  # [추가] 구글 전송을 위한 라이브러리
 FULL_URL = "https://ahp-platform-bbee45epwqjjy2zfpccz7p.streamlit.app/%EC%84%A4%EB%AC%B8_%EC%A7%84%ED%96%89"
 # ==============================================================================
 
-# [추가] 구글 시트 전송 함수 (사용자님의 기존 로직에 영향을 주지 않는 독립 함수)
-def send_to_google_cloud(user_key, goal_name, respondent, raw_data):
-    # 사용자님의 구글 Apps Script URL을 여기에 입력하세요.
-    WEBAPP_URL = "https://script.google.com/macros/s/AKfycbw-c1Cf71eSMFaouFhN_YziqOl05KBqZzt4-qOXFwkbFBUQrS4ADMozoIswYdAsQiIIOQ/exec" 
-    payload = {
-        "user_key": user_key,
-        "project_name": goal_name,
-        "respondent": respondent,
-        "raw_data": raw_data
-    }
-    try:
-        requests.post(WEBAPP_URL, json=payload, timeout=5)
-    except:
-        pass
+# [추가] 구글 시트 백업: 제출 시 로컬 대기열에 기록하고, 전송은 백그라운드 작업자가 재시도와 함께 처리
+@st.cache_resource
+def get_backup_worker():
+    return OutboxWorker(Outbox()).start()
 
-CONFIG_DIR = "survey_config"
 os.makedirs(CONFIG_DIR, exist_ok=True)
 
 st.set_page_config(page_title="설문 진행", page_icon="📝", layout="wide")
 
+# [추가] 설문 화면: components/ahp_survey 의 정적 컴포넌트(버전이 붙은 JS/CSS, 브라우저 캐시 사용).
+# 요청마다 보내는 것은 설문별 tasks JSON 뿐입니다.
+COMPONENT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "components", "ahp_survey")
+ahp_survey = components.declare_component("ahp_survey", path=COMPONENT_DIR)
+
+def expand_answers(tasks, answers):
+    """
+    컴포넌트가 돌려준 압축 응답 [[과제번호, r, c, 값], ...]을 기존 Raw_Data 형식
+    {"[과제명] A vs B": "3.00"}으로 펼칩니다. 형식이 맞지 않으면 ValueError(이유 포함)를 냅니다.
+    """
+    expanded, answered = {}, set()
+    for entry in answers or []:
+        t_idx, r, c, val = entry
+        t_idx, r, c, val = int(t_idx), int(r), int(c), float(val)
+        # 음수 번호는 파이썬 인덱싱에서 뒤에서부터 골라지므로 범위를 직접 확인합니다.
+        if not 0 <= t_idx < len(tasks):
+            raise ValueError(f"잘못된 응답 값: {entry}")
+        items = tasks[t_idx]["items"]
+        if not (0 < val < float("inf")) or r == c or not (0 <= r < len(items) and 0 <= c < len(items)):
+            raise ValueError(f"잘못된 응답 값: {entry}")
+        expanded[answer_key(tasks[t_idx]["name"], items[r], items[c])] = f"{val:.2f}"
+        answered.add(t_idx)
+    missing = [t["name"] for i, t in enumerate(tasks) if i not in answered]
+    if missing:
+        raise ValueError(f"응답이 없는 과제: {', '.join(missing)}")
+    return expanded
+
+# [추가] 설문 설정 캐시: 응답자마다 설정 파일을 다시 읽지 않도록,
+# 설문 id와 파일 수정 시각(mtime)을 키로 해석된 설정과 과제 목록을 프로세스 안에 보관합니다.
+@st.cache_resource(max_entries=512, show_spinner=False)
+def _load_survey(survey_id, mtime_ns):
+    with open(os.path.join(CONFIG_DIR, f"{survey_id}.json"), "r", encoding="utf-8") as f:
+        survey_data = json.load(f)
+    return {"data": survey_data, "tasks": build_tasks(survey_data)}
+
+def load_survey(survey_id):
+    """캐시된 {data, tasks}를 돌려줍니다 (설정 파일이 없으면 None). 파일이 바뀌면 mtime이 달라져 다시 만듭니다."""
+    try:
+        mtime_ns = os.stat(os.path.join(CONFIG_DIR, f"{survey_id}.json")).st_mtime_ns
+    except OSError:
+        return None
+    return _load_survey(survey_id, mtime_ns)
+
+
 query_params = st.query_params
 raw_id = query_params.get("id", None)
 if isinstance(raw_id, list): survey_id = raw_id[0] if raw_id else None
@@ -41,10 +76,9 @@ else: survey_id = raw_id
 survey_data = None
 
 if survey_id:
-    config_path = os.path.join(CONFIG_DIR, f"{survey_id}.json")
-    if os.path.exists(config_path):
-        with open(config_path, "r", encoding="utf-8") as f:
-            survey_data = json.load(f)
+    survey = load_survey(survey_id)
+    if survey:
+        survey_data = survey["data"]
         is_respondent = True
     else:
         st.error("유효하지 않은 링크입니다."); st.stop()
@@ -57,465 +91,59 @@ if not is_respondent:
     if not survey_data:
         st.warning("⚠️ [1번 페이지]에서 구조를 먼저 확정하세요."); st.stop()
     project_key = st.text_input("프로젝트 비밀번호(Key) 설정", type="password")
+    reduced = st.checkbox(f"✂️ 큰 그룹은 질문 수 줄이기 (항목 {REDUCED_MIN_ITEMS}개 이상: n(n-1)/2 → 2n-3문항)",
+                          help="순위가 인접한 쌍과 한 칸 건너뛴 쌍만 묻고, 나머지 비교는 결과 분석 시 불완전 행렬 방법(Harker)으로 추정합니다.")
     if st.button("🔗 공유 링크 생성하기", type="primary", use_container_width=True):
         if not project_key: st.error("비밀번호 설정이 필요합니다.")
         else:
-            full_structure = {**survey_data, "secret_key": project_key}
+            full_structure = {**survey_data, "secret_key": project_key, "pair_mode": "reduced" if reduced else "full"}
             survey_id = uuid.uuid4().hex[:8]
             with open(os.path.join(CONFIG_DIR, f"{survey_id}.json"), "w", encoding="utf-8") as f:
                 json.dump(full_structure, f, ensure_ascii=False, indent=2)
             st.code(f"{FULL_URL}?id={survey_id}")
             st.success("공유 링크가 생성되었습니다.")
 
+    backup = get_backup_worker().stats()
+    st.caption(f"☁️ 구글 백업 대기 {backup['pending']}건 · 재시도 중 {backup['retrying']}건 · 실패 보관 {backup['dead']}건 · 전송 완료 {backup['sent']}건")
+    if backup["dead"] and st.button("🔁 실패한 백업 다시 보내기"):
+        get_backup_worker().outbox.retry_dead(); get_backup_worker().notify(); st.rerun()
+
 else:
     st.title(f"📝 {survey_data['goal']}")
-    tasks = []
-    if len(survey_data["main_criteria"]) > 1:
-        tasks.append({"name": "📂 1. 평가 기준 중요도 비교", "items": survey_data["main_criteria"]})
-    for cat, items in survey_data["sub_criteria"].items():
-        if len(items) > 1:
-            tasks.append({"name": f"📂 2. [{cat}] 세부 항목 평가", "items": items})
-
-    js_tasks = json.dumps(tasks, ensure_ascii=False)
-
-    html_code = f"""
-    <!DOCTYPE html>
-    <html lang="ko">
-    <head>
-    <meta charset="UTF-8">
-    <style>
-        body {{ font-family: "Pretendard", sans-serif; padding: 10px; background: #f8f9fa; }}
-        .container {{ max-width: 700px; margin: 0 auto; background: white; padding: 25px; border-radius: 15px; box-shadow: 0 4px 15px rgba(0,0,0,0.05); }}
-        .step {{ display: none; }} .active {{ display: block; }}
-        
-        .ranking-board {{ background: #f1f3f5; padding: 18px; border-radius: 12px; margin-bottom: 25px; border: 1px solid #dee2e6; }}
-        .board-title {{ font-weight: bold; color: #495057; font-size: 0.9em; margin-bottom: 15px; display: flex; justify-content: space-between; align-items: center; }}
-        .status-pill {{ padding: 4px 12px; border-radius: 20px; font-size: 0.82em; font-weight: bold; }}
-        
-        .board-grid {{ display: flex; gap: 10px; overflow-x: auto; padding-bottom: 10px; }}
-        
-        .board-item {{ 
-            min-width: 140px; background: white; padding: 12px; border-radius: 12px; 
-            text-align: center; border: 1px solid #dee2e6; 
-            flex: 1; display: flex; flex-direction: column; gap: 5px; 
-            position: relative; 
-            transition: all 0.3s ease;
-        }}
-        
-        .flipped-card {{
-            border: 2px solid #fa5252 !important;
-            background-color: #fff5f5 !important;
-            box-shadow: 0 4px 12px rgba(250, 82, 82, 0.15);
-        }}
-
-        .item-name {{ font-weight: 800; color: #343a40; border-bottom: 1px solid #f1f3f5; padding-bottom: 6px; }}
-        .rank-row {{ display: flex; justify-content: space-between; font-size: 0.85em; color: #666; }}
-        .rank-val {{ font-weight: bold; color: #228be6; }}
-        
-        .error-text {{ color: #fa5252 !important; font-weight: 900; }}
-        .match-text {{ color: #228be6; }}
-
-        .card {{ background: #fff; padding: 30px; border-radius: 15px; text-align: center; margin-bottom: 20px; border: 1px solid #e9ecef; box-shadow: 0 4px 12px rgba(0,0,0,0.03); }}
-        input[type=range] {{ -webkit-appearance: none; width: 100%; height: 12px; background: #dee2e6; border-radius: 6px; outline: none; margin: 35px 0; }}
-        input[type=range]::-webkit-slider-thumb {{ -webkit-appearance: none; appearance: none; width: 28px; height: 28px; background: #228be6; border: 4px solid white; border-radius: 50%; cursor: pointer; box-shadow: 0 2px 6px rgba(0,0,0,0.2); position: relative; z-index: 5; }}
-
-        .btn {{ width: 100%; padding: 15px; background: #228be6; color: white; border: none; border-radius: 10px; font-size: 1.1em; font-weight: bold; cursor: pointer; }}
-        .btn-secondary {{ background: #adb5bd; }}
-        .btn-reset {{ background: #868e96; color: white; }} 
-        
-        .btn-grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 15px; margin-top: 20px; }}
-
-        .modal {{ display: none; position: fixed; top:0; left:0; width:100%; height:100%; background:rgba(0,0,0,0.7); justify-content:center; align-items:center; z-index:9999; }}
-        .modal-box {{ background:white; padding:35px; border-radius:20px; width:90%; max-width:450px; text-align:center; }}
-        
-        .flip-list {{ text-align: left; background: #fff5f5; padding: 15px; border-radius: 8px; margin-bottom: 20px; border: 1px solid #ffc9c9; font-size: 0.9em; color: #c92a2a; }}
-        .flip-item {{ margin-bottom: 4px; font-weight: bold; }}
-    </style>
-    </head>
-    <body>
-    <div class="container">
-        <h3 id="task-title" style="margin-top:0; color:#212529;"></h3>
-
-        <div id="live-board" class="ranking-board" style="display:none;">
-            <div class="board-title">
-                <span>📊 실시간 순위 현황</span>
-                <span id="status-pill" class="status-pill">체크 중</span>
-            </div>
-            <div id="board-grid" class="board-grid"></div>
-        </div>
-
-        <div id="step-ranking" class="step">
-            <p><b>1단계:</b> 각 항목의 중요도 순위를 먼저 정해주세요.</p>
-            <div id="ranking-list" style="margin-bottom:20px;"></div>
-            <button class="btn" onclick="startCompare()">설문 시작하기</button>
-        </div>
-
-        <div id="step-compare" class="step">
-            <div class="card">
-                <div style="display:flex; justify-content:space-between; font-weight:bold; font-size:1.4em; margin-bottom:20px;">
-                    <span id="item-a" style="color:#228be6;">A</span>
-                    <span style="color:#dee2e6;">VS</span>
-                    <span id="item-b" style="color:#fa5252;">B</span>
-                </div>
-                <div style="font-size:0.95em; color:#adb5bd; margin-bottom:10px;">
-                    (기존 순위: <span id="hint-a"></span>위) vs (기존 순위: <span id="hint-b"></span>위)
-                </div>
-                <input type="range" id="slider" min="-4" max="4" value="0" step="1" oninput="updateUI(true)">
-                <div id="val-display" style="font-weight:bold; color:#343a40; font-size:1.4em;">동등함</div>
-            </div>
-            
-            <div id="btn-area" class="btn-grid"></div>
-        </div>
-
-        <div id="step-finish" class="step">
-            <div style="text-align:center; padding:40px 0;">
-                <h2>✅ 모든 설문 완료</h2>
-                <textarea id="result-code" readonly style="width:100%; height:150px; padding:15px; border-radius:12px; border:1px solid #dee2e6; background:#f8f9fa; font-family:monospace;"></textarea>
-            </div>
-        </div>
-    </div>
-
-    <div id="modal-flip" class="modal">
-        <div class="modal-box">
-            <h3 style="color:#fa5252; margin-top:0;">⚠️ 순위 역전 감지</h3>
-            <p style="font-size:0.95em; color:#495057; line-height:1.7; margin-bottom:15px;">
-                설정하신 순위와 달리, 아래 항목들의 점수가 뒤집혔습니다.<br>
-                (동점은 허용되지만, <b>확실히 낮아진 경우</b>입니다)
-            </p>
-            <div id="flip-details" class="flip-list"></div>
-            <div style="display:grid; gap:12px;">
-                <button class="btn" onclick="closeModal('flip', 'resurvey')" style="background:#228be6;">👈 응답 수정 (기존 순위 유지)</button>
-                <button class="btn" onclick="closeModal('flip', 'updaterank')" style="background:#868e96;">✅ 변경 인정 (설정값 업데이트)</button>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        const tasks = {js_tasks};
-        let currentTaskIdx = 0, items = [], pairs = [], matrix = [], pairIdx = 0, initialRanks = [];
-        let allAnswers = {{}};
-        let currentPairSwapped = false; 
-
-        function loadTask() {{
-            if (currentTaskIdx >= tasks.length) {{ finishAll(); return; }}
-            const task = tasks[currentTaskIdx]; items = task.items;
-            document.getElementById('task-title').innerText = task.name;
-            const listDiv = document.getElementById('ranking-list'); listDiv.innerHTML = "";
-            let options = '<option value="" selected disabled>선택</option>';
-            for(let i=1; i<=items.length; i++) options += `<option value="${{i}}">${{i}}위</option>`;
-            items.forEach((item, idx) => {{
-                listDiv.innerHTML += `<div style="display:flex; justify-content:space-between; padding:14px; background:#f8f9fa; border-radius:10px; margin-bottom:10px; align-items:center; border:1px solid #eee;">
-                    <span style="font-weight:bold;">${{item}}</span><select id="rank-${{idx}}">${{options}}</select></div>`;
-            }});
-            showStep('step-ranking'); document.getElementById('live-board').style.display = 'none';
-        }}
-
-        function startCompare() {{
-            initialRanks = []; let tempIdxMap = [];
-            for(let i=0; i<items.length; i++) {{
-                const el = document.getElementById('rank-'+i);
-                if(!el.value) {{ alert("순위를 모두 정해주세요."); return; }}
-                initialRanks[i] = parseInt(el.value);
-                tempIdxMap.push({{ name: items[i], rank: initialRanks[i], originIdx: i }});
-            }}
-            if(new Set(initialRanks).size !== initialRanks.length) {{ alert("중복 순위가 있습니다."); return; }}
-            
-            tempIdxMap.sort((a, b) => a.rank - b.rank);
-            pairs = [];
-            for(let i=0; i<tempIdxMap.length; i++) {{
-                for(let j=i+1; j<tempIdxMap.length; j++) {{
-                    pairs.push({{ 
-                        r: tempIdxMap[i].originIdx, c: tempIdxMap[j].originIdx, 
-                        a: tempIdxMap[i].name, b: tempIdxMap[j].name 
-                    }});
-                }}
-            }}
-            const n = items.length; matrix = Array.from({{length: n}}, () => Array(n).fill(0));
-            for(let i=0; i<n; i++) matrix[i][i] = 1;
-            pairIdx = 0; showStep('step-compare'); renderPair();
-        }}
-
-        function renderPair() {{
-            const p = pairs[pairIdx];
-            
-            let savedWeight = matrix[p.r][p.c];
-            let initialSliderVal = 0;
-            
-            if (savedWeight !== 0 && savedWeight !== 1) {{
-                if (savedWeight > 1) initialSliderVal = -(Math.round(savedWeight) - 1); 
-                else initialSliderVal = Math.round(1/savedWeight) - 1; 
-            }}
-
-            let weights = calculateWeights(initialSliderVal); 
-            const EPSILON = 0.00001;
-            
-            currentPairSwapped = false;
-            if (pairIdx > 0 && weights[p.c] > weights[p.r] + EPSILON) {{
-                currentPairSwapped = true;
-            }}
-
-            let leftName = currentPairSwapped ? p.b : p.a;
-            let rightName = currentPairSwapped ? p.a : p.b;
-            let leftRankHint = currentPairSwapped ? initialRanks[p.c] : initialRanks[p.r];
-            let rightRankHint = currentPairSwapped ? initialRanks[p.r] : initialRanks[p.c];
-
-            document.getElementById('item-a').innerText = leftName; 
-            document.getElementById('item-b').innerText = rightName;
-            document.getElementById('hint-a').innerText = leftRankHint;
-            document.getElementById('hint-b').innerText = rightRankHint;
-            
-            let displayVal = currentPairSwapped ? (initialSliderVal * -1) : initialSliderVal;
-            document.getElementById('slider').value = displayVal;
-            
-            const btnArea = document.getElementById('btn-area');
-            if (pairIdx === 0) {{
-                btnArea.innerHTML = `
-                    <button class="btn btn-reset" onclick="resetTask()">🔄 순위 변경</button>
-                    <button class="btn" onclick="checkLogic()">다음 질문 ➡</button>
-                `;
-            }} else {{
-                btnArea.innerHTML = `
-                    <button class="btn btn-secondary" onclick="goBack()">⬅ 이전 질문</button>
-                    <button class="btn" onclick="checkLogic()">다음 질문 ➡</button>
-                `;
-            }}
-
-            document.getElementById('live-board').style.display = 'block';
-            updateUI(false);
-        }}
-
-        function updateUI(checkAlert = false) {{
-            const slider = document.getElementById('slider');
-            let val = parseInt(slider.value);
-            let leftName = document.getElementById('item-a').innerText;
-
-            if (checkAlert && val > 0) {{
-                if (pairIdx === 0) {{
-                     alert(`🚫 [논리 보호]\\n\\n설정하신 순위에 따라 '${{leftName}}' 항목이 더 중요합니다.\\n따라서 점수도 '${{leftName}}' 쪽(왼쪽)으로만 줄 수 있습니다.`);
-                     slider.value = 0; val = 0;
-                }} else {{
-                    alert(`🚫 [논리 보호]\\n\\n현재 데이터 상 '${{leftName}}' 항목이 더 중요합니다.\\n따라서 점수도 '${{leftName}}' 쪽(왼쪽)으로만 줄 수 있습니다.`);
-                    slider.value = 0; val = 0;
-                }}
-            }}
-
-            const disp = document.getElementById('val-display');
-            let perc = (val + 4) * 12.5;
-            
-            if(val < 0) slider.style.background = `linear-gradient(to right, #dee2e6 0%, #dee2e6 ${{perc}}%, #228be6 ${{perc}}%, #228be6 50%, #dee2e6 50%, #dee2e6 100%)`;
-            else if(val > 0) slider.style.background = `linear-gradient(to right, #dee2e6 0%, #dee2e6 50%, #fa5252 50%, #fa5252 ${{perc}}%, #dee2e6 ${{perc}}%, #dee2e6 100%)`;
-            else slider.style.background = '#dee2e6';
-
-            let rightName = document.getElementById('item-b').innerText;
-            if(val == 0) disp.innerText = "동등함 (1:1)";
-            else if(val < 0) disp.innerText = `${{leftName}} ${{Math.abs(val)+1}}배 중요`;
-            else disp.innerText = `${{rightName}} ${{Math.abs(val)+1}}배 중요`; 
-            
-            updateBoard();
-        }}
-
-        function updateBoard() {{
-            const grid = document.getElementById('board-grid'); 
-            grid.innerHTML = "";
-            const pill = document.getElementById('status-pill');
-            
-            let weights = calculateWeights(); 
-            const EPSILON = 0.00001;
-
-            let indexedWeights = weights.map((w, i) => ({{w, i}}));
-            indexedWeights.sort((a,b) => {{
-                if (Math.abs(b.w - a.w) > EPSILON) return b.w - a.w;
-                return initialRanks[a.i] - initialRanks[b.i];
-            }});
-
-            let rankMap = {{}};
-            indexedWeights.forEach((obj, idx) => rankMap[obj.i] = idx + 1);
-
-            let flippedIndices = new Set();
-            if (pairIdx > 0) {{
-                for(let i=0; i<items.length; i++) {{
-                    for(let j=0; j<items.length; j++) {{
-                        if(i === j) continue;
-                        if (initialRanks[i] < initialRanks[j] && rankMap[i] > rankMap[j]) {{
-                            flippedIndices.add(i); flippedIndices.add(j);
-                        }}
-                    }}
-                }}
-            }}
-
-            let hasFlip = (flippedIndices.size > 0);
-            
-            if (pairIdx === 0) {{
-                pill.innerText = "✅ 순위 설정 완료"; pill.style.background = "#ebfbee"; pill.style.color = "#2f9e44";
-            }} else if (hasFlip) {{
-                pill.innerText = "⚠️ 순위 역전 감지"; pill.style.background = "#fff5f5"; pill.style.color = "#fa5252";
-            }} else {{
-                pill.innerText = "✅ 논리 일치"; pill.style.background = "#ebfbee"; pill.style.color = "#2f9e44";
-            }}
-
-            let fixedOrder = items.map((name, i) => ({{name, org: initialRanks[i], idx: i}}))
-                                    .sort((a,b) => a.org - b.org);
-
-            fixedOrder.forEach(item => {{
-                let isFlipped = flippedIndices.has(item.idx);
-                let curRank = (pairIdx === 0) ? item.org : rankMap[item.idx];
-                
-                let borderStyle = isFlipped ? "2px solid #fa5252 !important" : "1px solid #dee2e6";
-                let bgStyle = isFlipped ? "#fff5f5 !important" : "white";
-                let textColorClass = isFlipped ? "error-text" : "match-text";
-                let shadow = isFlipped ? "box-shadow: 0 4px 12px rgba(250, 82, 82, 0.15);" : "";
-
-                let currentRankHtml = "";
-                if (pairIdx > 0) {{
-                    currentRankHtml = `<div class="rank-row"><span>현재:</span><span class="rank-val ${{textColorClass}}">${{curRank}}위</span></div>`;
-                }}
-
-                grid.innerHTML += `
-                <div class="board-item" style="border: ${{borderStyle}}; background-color: ${{bgStyle}}; ${{shadow}}">
-                    <span class="item-name">${{item.name}}</span>
-                    <div class="rank-row"><span>기존:</span><span class="rank-val">${{item.org}}위</span></div>
-                    ${{currentRankHtml}}
-                </div>`;
-            }});
-        }}
-
-        function calculateWeights(tempVal = null) {{
-            const n = items.length; 
-            let tempMatrix = matrix.map(row => [...row]);
-            let p = pairs[pairIdx];
-            
-            let val = tempVal !== null ? tempVal : parseInt(document.getElementById('slider').value);
-            
-            if (currentPairSwapped && tempVal === null) {{
-                val = val * -1;
-            }}
-
-            let w_abs = Math.abs(val) + 1;
-            let w_final = (val <= 0) ? w_abs : (1 / w_abs);
-
-            tempMatrix[p.r][p.c] = w_final; 
-            tempMatrix[p.c][p.r] = 1 / w_final;
-            
-            for(let i=0; i<n; i++) {{ for(let j=0; j<n; j++) {{ if(tempMatrix[i][j] === 0) tempMatrix[i][j] = 1; }} }}
-            let weights = tempMatrix.map(row => Math.pow(row.reduce((a, b) => a * b, 1), 1/n));
-            let sum = weights.reduce((a, b) => a + b, 0);
-            return weights.map(v => v / sum);
-        }}
-
-        function checkLogic() {{
-            if (pairIdx === 0) {{ saveAndNext(); return; }}
-            const sliderVal = parseInt(document.getElementById('slider').value);
-            
-            let weights = calculateWeights(sliderVal);
-            const EPSILON = 0.00001;
-            let indexedWeights = weights.map((w, i) => ({{w, i}})).sort((a,b) => {{
-                if (Math.abs(b.w - a.w) > EPSILON) return b.w - a.w;
-                return initialRanks[a.i] - initialRanks[b.i];
-            }});
-            let rankMap = {{}};
-            indexedWeights.forEach((obj, idx) => rankMap[obj.i] = idx + 1);
-
-            let flippedPairs = [];
-            for(let i=0; i<items.length; i++) {{
-                for(let j=0; j<items.length; j++) {{
-                    if(i === j) continue;
-                    if(initialRanks[i] < initialRanks[j] && rankMap[i] > rankMap[j]) {{
-                        flippedPairs.push(`${{items[i]}} (기존 ${{initialRanks[i]}}위) ↔ ${{items[j]}} (기존 ${{initialRanks[j]}}위)`);
-                    }}
-                }}
-            }}
-
-            if (flippedPairs.length > 0) {{ 
-                const listDiv = document.getElementById('flip-details');
-                listDiv.innerHTML = "";
-                [...new Set(flippedPairs)].forEach(txt => {{
-                    listDiv.innerHTML += `<div class="flip-item">❌ ${{(txt)}}</div>`;
-                }});
-                document.getElementById('modal-flip').style.display = 'flex'; 
-                return; 
-            }}
-
-            saveAndNext();
-        }}
-
-        function closeModal(type, action) {{
-            document.getElementById('modal-' + type).style.display = 'none';
-            if (type === 'flip') {{
-                if(action === 'updaterank') {{
-                    let weights = calculateWeights();
-                    let sortedIdx = weights.map((w, i) => i).sort((a, b) => weights[b] - weights[a]);
-                    sortedIdx.forEach((idx, i) => {{ initialRanks[idx] = i + 1; }});
-                    saveAndNext();
-                }} else {{
-                    document.getElementById('slider').value = 0; updateUI();
-                }}
-            }}
-        }}
-
-        function resetTask() {{
-            if(confirm("순위 설정 화면으로 돌아가시겠습니까?\\n(입력한 내용은 초기화됩니다)")) {{ 
-                loadTask(); 
-            }}
-        }}
-
-        function goBack() {{ if (pairIdx > 0) {{ pairIdx--; renderPair(); }} }}
-
-        function saveAndNext() {{
-            const slider = document.getElementById('slider');
-            let val = parseInt(slider.value);
-            
-            if (currentPairSwapped) {{
-                val = val * -1;
-            }}
-
-            let w_abs = Math.abs(val) + 1;
-            let w_final = (val <= 0) ? w_abs : (1 / w_abs);
-
-            const p = pairs[pairIdx];
-            matrix[p.r][p.c] = w_final; matrix[p.c][p.r] = 1/w_final;
-            
-            allAnswers[`[${{tasks[currentTaskIdx].name}}] ${{p.a}} vs ${{p.b}}`] = w_final.toFixed(2);
-            
-            pairIdx++;
-            if (pairIdx >= pairs.length) {{ currentTaskIdx++; loadTask(); }}
-            else {{ renderPair(); }}
-        }}
-
-        function finishAll() {{
-            showStep('step-finish'); document.getElementById('live-board').style.display = 'none';
-            document.getElementById('result-code').value = JSON.stringify(allAnswers, null, 2);
-        }}
-
-        function showStep(id) {{ document.querySelectorAll('.step').forEach(e => e.classList.remove('active')); document.getElementById(id).classList.add('active'); }}
-        loadTask();
-    </script>
-    </body>
-    </html>
-    """
-    components.html(html_code, height=850, scrolling=True)
+    # 설문을 마치면 컴포넌트가 압축 응답을 직접 돌려줍니다 (결과 코드 복사·붙여넣기 없음).
+    result = ahp_survey(tasks=survey["tasks"], key=f"ahp_survey_{survey_id}", default=None)
 
     st.divider()
-    with st.form("save_v_final"):
-        respondent = st.text_input("응답자 성함")
-        code = st.text_area("결과 코드 붙여넣기")
-        if st.form_submit_button("최종 제출"):
-            if respondent and code:
-                try:
-                    json.loads(code)
-                    goal_clean = survey_data["goal"].replace(" ", "_")
-                    secret_key = survey_data.get("secret_key", "public")
-                    
-                    # 1. 로컬 저장 (기존 코드 그대로 유지)
-                    if not os.path.exists("survey_data"): os.makedirs("survey_data")
-                    file_path = f"survey_data/{secret_key}_{goal_clean}.csv"
-                    save_dict = {"Time": datetime.now().strftime("%Y-%m-%d %H:%M"), "Respondent": respondent, "Raw_Data": code}
-                    df = pd.DataFrame([save_dict])
-                    try: old_df = pd.read_csv(file_path)
-                    except: old_df = pd.DataFrame()
-                    pd.concat([old_df, df], ignore_index=True).to_csv(file_path, index=False)
-                    
-                    # 2. [추가] 구글 시트로 백업 전송 (데이터 유실 방지용)
-                    send_to_google_cloud(secret_key, goal_clean, respondent, code)
-                    
-                    st.success("✅ 제출 성공!"); st.balloons()
-                except: st.error("코드 오류")
+    submitted = st.session_state.setdefault("submitted_ids", set())
+    if not result:
+        st.caption("📝 위 설문을 모두 마치면 여기에서 제출할 수 있습니다.")
+    elif result.get("id") in submitted:
+        st.success("✅ 제출 성공!")
+    else:
+        with st.form("save_v_final"):
+            respondent = st.text_input("응답자 성함")
+            if st.form_submit_button("최종 제출"):
+                if not respondent:
+                    st.error("성함을 입력하세요.")
+                else:
+                    try:
+                        raw_data = json.dumps(expand_answers(survey["tasks"], result.get("answers")), ensure_ascii=False)
+                        # 제출 시점에 검증하고 과제별 가중치·λmax·CR을 한 번 계산해 함께 저장합니다 (결과 센터 기본 옵션 기준).
+                        metrics = json.dumps(compute_metrics(raw_data), ensure_ascii=False)
+                    except (ValueError, TypeError, IndexError, KeyError) as e:
+                        st.error(f"응답 형식 오류: {e}")
+                    else:
+                        goal_clean = survey_data["goal"].replace(" ", "_")
+                        secret_key = survey_data.get("secret_key", "public")
+
+                        # 1. 로컬 저장 (파일 잠금 + 끝에 한 줄 추가: 응답 수와 무관하게 일정한 비용)
+                        file_path = project_csv_path(secret_key, goal_clean)
+                        save_dict = {"Time": datetime.now().strftime("%Y-%m-%d %H:%M"), "Respondent": respondent,
+                                     "Raw_Data": raw_data, "Metrics": metrics}
+                        append_response(file_path, save_dict)
+
+                        # 2. [추가] 구글 시트 백업 대기열에 기록 (전송은 백그라운드, 실패 시 자동 재시도)
+                        enqueue_backup(get_backup_worker(), secret_key, goal_clean, respondent, raw_data)
+
+                        submitted.add(result.get("id"))
+                        st.success("✅ 제출 성공!"); st.balloons()
@@ -0,0 +1,367 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+from ahp_engine import parse_comparisons
+from survey_schema import load_project_schema
+from survey_store import CHUNK_ROWS, DATA_FOLDER, file_lock, iter_responses_since
+
+# ==============================================================================
+# [설정] 이진 응답 저장소 (survey_data/<key>_<goal>.store/)
+#   - schema.json      : 과제·항목·비교쌍 사전, 열 위치, 원본 CSV 동기화 위치
+#   - judgments.f4     : 응답자 × 비교쌍 float32 배열 (행 우선, 빈 값은 NaN)
+#                        열이 늘면 judgments.<열 수>.f4로 새로 쓰고, 스키마의 data_file이 가리키는 파일만 읽습니다.
+#   - respondents.jsonl: 응답자별 Time, Respondent (+ 제출 시점에 계산된 Metrics)
+#   - respondents.idx  : respondents.jsonl의 행별 시작 바이트 위치 (int64). 끝 위치는 스키마의 respondents_size
+# ==============================================================================
+SCHEMA_VERSION = 1
+DTYPE = np.float32
+
+def store_dir_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".store"
+
+# ==============================================================================
+# [함수] Raw_Data 파싱
+# ==============================================================================
+def parse_raw_data(raw):
+    """Raw_Data JSON을 {과제명: (정렬된 항목 목록, {(A, B): 값})} 으로 변환합니다."""
+    survey_dict = json.loads(raw)
+    tasks = {}
+    for k, v in survey_dict.items():
+        if "]" in k:
+            split_idx = k.rfind("]")
+            task_name = k[1:split_idx]
+            pair = k[split_idx+1:].strip()
+            if task_name not in tasks: tasks[task_name] = {}
+            tasks[task_name][pair] = v
+    return {t_name: parse_comparisons(comps) for t_name, comps in tasks.items()}
+
+# ==============================================================================
+# [클래스] 이진 응답 저장소
+# ==============================================================================
+class ResponseStore:
+    """
+    프로젝트별 과제/비교쌍 사전과 응답자 × 비교쌍 숫자 배열로 응답을 보관합니다.
+    비교값은 사전의 항목 순서 기준 (i < j) 방향으로 정규화되어 저장되며,
+    judgments()는 파일을 메모리 매핑하므로 JSON을 다시 해석하지 않습니다.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.schema = self._load_schema()
+        self._key_cache = {}
+
+    # --- 경로 & 스키마 -----------------------------------------------------------
+    def _path(self, name): return os.path.join(self.store_dir, name)
+
+    def _empty_schema(self):
+        return {"version": SCHEMA_VERSION, "tasks": [], "n_cols": 0, "n_rows": 0, "respondents_size": 0,
+                "generation": os.urandom(8).hex(), "source": {"generation": None, "offset": 0}}
+
+    def _load_schema(self):
+        try:
+            with open(self._path("schema.json"), "r", encoding="utf-8") as f:
+                schema = json.load(f)
+            if schema.get("version") == SCHEMA_VERSION: return schema
+        except (OSError, ValueError):
+            pass
+        return self._empty_schema()
+
+    def _save_schema(self):
+        tmp = self._path("schema.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.schema, f, ensure_ascii=False)
+        os.replace(tmp, self._path("schema.json"))
+
+    @property
+    def n_rows(self): return self.schema["n_rows"]
+
+    @property
+    def generation(self): return self.schema["generation"]
+
+    @property
+    def tasks(self): return self.schema["tasks"]
+
+    # --- 읽기 -------------------------------------------------------------------
+    @property
+    def data_file(self): return self._path(self.schema.get("data_file", "judgments.f4"))
+
+    def judgments(self):
+        """(n_rows, n_cols) float32 배열을 메모리 매핑으로 엽니다."""
+        shape = (self.n_rows, self.schema["n_cols"])
+        if not shape[0] or not shape[1]:
+            return np.full(shape, np.nan, dtype=DTYPE)
+        return np.memmap(self.data_file, dtype=DTYPE, mode="r", shape=shape)
+
+    def iter_respondents(self, start=0, stop=None):
+        """응답자 목록을 한 줄씩 읽습니다. 행 위치 색인으로 start 행까지 바로 이동하므로 앞부분을 다시 읽지 않습니다."""
+        stop = self.n_rows if stop is None else min(stop, self.n_rows)
+        if start >= stop: return
+        offsets = np.fromfile(self._path("respondents.idx"), dtype=np.int64, count=1, offset=start * 8)
+        with open(self._path("respondents.jsonl"), "rb") as f:
+            f.seek(int(offsets[0]))
+            for _ in range(stop - start):
+                yield json.loads(f.readline())
+
+    def respondents(self, start=0, stop=None):
+        return list(self.iter_respondents(start, stop))
+
+    def task_stack(self, task_idx, start=0, stop=None):
+        """
+        과제 하나의 (K, n, n) 행렬 묶음을 만듭니다. 반환값: (행 번호 배열, 행렬 묶음)
+        해당 과제에 응답하지 않은 행은 제외하고, 빠진 비교쌍은 nan으로 둡니다 (analyze_stack이 불완전 행렬로 채움).
+        """
+        task = self.tasks[task_idx]
+        n, pairs = len(task["items"]), np.asarray(task["pairs"], dtype=int).reshape(-1, 2)
+        cols = np.asarray(self.judgments()[start:stop, task["offset"]:task["offset"] + len(pairs)], dtype=float)
+        rows = np.flatnonzero(~np.isnan(cols).all(axis=1)) if len(pairs) else np.arange(0)
+        vals = cols[rows]
+        stack = np.full((len(rows), n, n), np.nan)
+        stack[:, np.arange(n), np.arange(n)] = 1.0
+        with np.errstate(divide="ignore"):
+            stack[:, pairs[:, 0], pairs[:, 1]] = vals
+            stack[:, pairs[:, 1], pairs[:, 0]] = 1 / vals
+        return rows + start, stack
+
+    # --- 쓰기 -------------------------------------------------------------------
+    def _task(self, t_name, items):
+        """과제를 찾고, 처음 보는 과제/항목이면 사전에 추가합니다 (기존 항목 순서는 바꾸지 않음)."""
+        task = self._task_index.get(t_name)
+        if task is None:
+            task = {"name": t_name, "items": [], "pairs": [], "offset": None, "width": 0}
+            self.tasks.append(task); self._task_index[t_name] = task
+        for item in items:
+            if item not in task["items"]: task["items"].append(item)
+        return task
+
+    def _column(self, task, a, b):
+        """과제 안에서 (A, B)의 열 번호와 방향(역수 여부)을 찾고, 처음 보는 비교쌍이면 사전에 추가합니다."""
+        t_name = task["name"]
+        i, j = task["items"].index(a), task["items"].index(b)
+        key = (min(i, j), max(i, j))
+        pair_map = self._pair_index.setdefault(t_name, {tuple(p): k for k, p in enumerate(task["pairs"])})
+        if key not in pair_map:
+            pair_map[key] = len(task["pairs"]); task["pairs"].append(list(key))
+        return t_name, pair_map[key], i > j
+
+    def _layout(self):
+        """과제별 열 시작 위치를 다시 계산합니다. 반환값: 이전 열 → 새 열 위치 (열이 추가된 경우)"""
+        old = {}
+        col = 0
+        for task in self.tasks:
+            if task["offset"] is not None:
+                for k in range(task.get("width", len(task["pairs"]))):
+                    old[task["offset"] + k] = col + k
+            task["offset"] = col
+            task["width"] = len(task["pairs"])
+            col += len(task["pairs"])
+        return old, col
+
+    def _begin_write(self):
+        self._task_index = {t["name"]: t for t in self.tasks}
+        self._pair_index = {}
+
+    @staticmethod
+    def _parse_keys(survey_dict):
+        """응답 키 → (과제명, A, B), 응답 키가 아니면 None. parse_raw_data와 같은 규칙으로 키 문자열을 해석합니다."""
+        parsed = {}
+        for k in survey_dict:
+            split_idx = k.rfind("]")
+            pair = k[split_idx+1:].strip() if split_idx >= 0 else ""
+            if " vs " not in pair:
+                parsed[k] = None; continue
+            a, b = pair.split(" vs ")
+            parsed[k] = (k[1:split_idx], a.strip(), b.strip())
+        return parsed
+
+    def _learn(self, parsed):
+        """처음 보는 키를 사전에 등록합니다. 새 항목은 기존처럼 과제별로 정렬해 추가합니다 (보정 결과가 행렬 방향에 따라 달라지므로)."""
+        by_task = {}
+        for hit in parsed.values():
+            if hit: by_task.setdefault(hit[0], set()).update(hit[1:])
+        tasks = {t_name: self._task(t_name, sorted(items)) for t_name, items in by_task.items()}
+        for k, hit in parsed.items():
+            self._key_cache[k] = self._column(tasks[hit[0]], hit[1], hit[2]) if hit else None
+
+    def seed(self, survey_schema):
+        """
+        빈 저장소의 과제·항목·비교쌍 사전을 설문 설정(survey_schema.SurveySchema)으로 미리 만들고,
+        모든 응답 키의 열 위치를 색인에 넣습니다. 이후 행 추가는 키 조회 + 배열 대입만 합니다.
+        항목 순서는 응답 해석(parse_raw_data)과 같은 정렬 순서를 씁니다.
+        """
+        self._begin_write()
+        for spec in survey_schema.tasks:
+            items = sorted(spec["items"])
+            task = self._task(spec["name"], items)
+            for i in range(len(items)):
+                for j in range(i + 1, len(items)):
+                    self._column(task, items[i], items[j])
+        for key, (t_idx, i, j) in survey_schema.key_index.items():
+            spec = survey_schema.tasks[t_idx]
+            self._key_cache[key] = self._column(self._task_index[spec["name"]], spec["items"][i], spec["items"][j])
+
+    def append_rows(self, df):
+        """CSV 행(Time, Respondent, Raw_Data)을 해석해 저장소 끝에 추가합니다. 파싱할 수 없는 행은 건너뜁니다."""
+        self._begin_write()
+        entries, metas = [], []
+        metrics_col = df["Metrics"] if "Metrics" in df else [None] * len(df)
+        for resp, t, raw, metrics in zip(df["Respondent"], df["Time"], df["Raw_Data"], metrics_col):
+            try:
+                survey_dict = json.loads(raw)
+                hits = [self._key_cache.get(k, False) for k in survey_dict]
+                parsed = self._parse_keys(survey_dict) if False in hits else None
+                values = [float(v) for k, v in survey_dict.items() if (parsed[k] if parsed else self._key_cache[k])]
+            except Exception:
+                continue
+            if parsed:
+                # 처음 보는 키가 있는 행만 키 문자열을 해석해 색인에 더하고, 나머지 행은 사전 조회만 합니다.
+                self._learn(parsed)
+                hits = [self._key_cache[k] for k in survey_dict]
+            cells = [(*hit, val) for hit, val in zip([h for h in hits if h], values)]
+            entries.append(cells)
+            meta = {"Time": None if t is None else str(t), "Respondent": None if resp is None else str(resp)}
+            if isinstance(metrics, str) and metrics.startswith("{"):
+                # 제출 시점에 계산된 결과(ahp_analysis.compute_metrics)는 응답자 목록에 함께 보관합니다.
+                try: meta["Metrics"] = json.loads(metrics)
+                except ValueError: pass
+            metas.append(meta)
+        if not entries:
+            return 0
+
+        old_cols = self.schema["n_cols"]
+        remap, n_cols = self._layout()
+        offsets = {task["name"]: task["offset"] for task in self.tasks}
+        block = np.full((len(entries), n_cols), np.nan, dtype=DTYPE)
+        cells = [(r, offsets[t_name] + k, flip, val) for r, row in enumerate(entries) for t_name, k, flip, val in row]
+        if cells:
+            r_idx, cols, flips, vals = (np.asarray(x) for x in zip(*cells))
+            with np.errstate(divide="ignore"):
+                block[r_idx, cols] = np.where(flips, 1 / vals.astype(float), vals)
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        if n_cols != old_cols and self.n_rows:
+            # 새 비교쌍이 생기면(드묾) 기존 배열을 새 열 배치로 새 파일에 한 번 다시 씁니다 (CHUNK_ROWS 행씩).
+            # 저장된 스키마는 동기화가 끝날 때까지 이전 파일을 가리키므로, 중간에 중단되어도 열 배치가 어긋나지 않습니다.
+            existing = self.judgments()
+            src, dst = np.array(list(remap), dtype=int), np.array(list(remap.values()), dtype=int)
+            name = f"judgments.{n_cols}.f4"
+            tmp = self._path(name + ".tmp")
+            with open(tmp, "wb") as f:
+                for lo in range(0, self.n_rows, CHUNK_ROWS):
+                    widened = np.full((min(CHUNK_ROWS, self.n_rows - lo), n_cols), np.nan, dtype=DTYPE)
+                    widened[:, dst] = existing[lo:lo + len(widened)][:, src]
+                    f.write(widened.tobytes())
+            del existing
+            os.replace(tmp, self._path(name))
+            self.schema["data_file"] = name
+        self.schema["n_cols"] = n_cols
+
+        # 저장 순서: 배열 → 응답자 목록 → 스키마(n_rows). 중간에 중단되면 n_rows 이후의 꼬리는 무시·절단됩니다.
+        with open(self.data_file, "ab") as f:
+            f.write(block.tobytes())
+        lines = [(json.dumps(m, ensure_ascii=False) + "\n").encode("utf-8") for m in metas]
+        size = self.schema["respondents_size"]
+        with open(self._path("respondents.jsonl"), "ab") as f:
+            f.write(b"".join(lines))
+        with open(self._path("respondents.idx"), "ab") as f:
+            f.write((size + np.cumsum([0] + [len(line) for line in lines[:-1]], dtype=np.int64)).tobytes())
+        self.schema["respondents_size"] = size + sum(len(line) for line in lines)
+        self.schema["n_rows"] += len(entries)
+        return len(entries)
+
+    def _data_files(self):
+        return [name for name in os.listdir(self.store_dir) if name.startswith("judgments.") and ".f4" in name]
+
+    def _remove_stale_data(self):
+        """스키마가 가리키지 않는 배열 파일(열을 늘린 뒤의 이전 파일, 중단된 동기화가 남긴 파일)을 지웁니다."""
+        current = os.path.basename(self.data_file)
+        for name in self._data_files():
+            if name != current: os.remove(self._path(name))
+
+    def _truncate_tail(self):
+        path = self.data_file
+        size = self.n_rows * self.schema["n_cols"] * np.dtype(DTYPE).itemsize
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f: f.truncate(size)
+        # 응답자 목록과 행 위치 색인은 스키마에 기록된 크기로 자릅니다 (파일을 읽지 않으므로 제출마다 비용이 일정).
+        path, idx_path = self._path("respondents.jsonl"), self._path("respondents.idx")
+        if not os.path.exists(path):
+            if not self.n_rows:
+                open(path, "w").close(); open(idx_path, "w").close()
+                self.schema["respondents_size"] = 0
+            return
+        if "respondents_size" not in self.schema or not os.path.exists(idx_path):
+            self._index_respondents()
+        with open(path, "r+b") as f:
+            if os.path.getsize(path) > self.schema["respondents_size"]: f.truncate(self.schema["respondents_size"])
+        with open(idx_path, "r+b") as f:
+            if os.path.getsize(idx_path) > self.n_rows * 8: f.truncate(self.n_rows * 8)
+
+    def _index_respondents(self):
+        """행 위치 색인이 없는 기존 저장소에서 한 번만 응답자 목록을 훑어 색인과 끝 위치를 만듭니다."""
+        offsets, size = [], 0
+        with open(self._path("respondents.jsonl"), "rb") as f:
+            for i, line in enumerate(f):
+                if i >= self.n_rows or not line.endswith(b"\n"): break
+                offsets.append(size); size += len(line)
+        with open(self._path("respondents.idx"), "wb") as f:
+            f.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        self.schema["respondents_size"] = size
+
+    def _reset(self):
+        self.schema = self._empty_schema()
+        self._key_cache = {}
+        os.makedirs(self.store_dir, exist_ok=True)
+        for name in self._data_files() + ["respondents.jsonl", "respondents.idx"]:
+            if os.path.exists(self._path(name)): os.remove(self._path(name))
+
+    def sync_from_csv(self, csv_path, survey_schema=None):
+        """
+        원본 CSV에서 마지막 동기화 이후 추가된 행만 변환해 저장소에 반영합니다.
+        CSV가 다시 쓰였으면(정리·재생성) 저장소를 처음부터 다시 만듭니다. 반환값: 추가된 행 수
+        survey_schema가 있으면 빈 저장소의 사전을 설문 설정 순서로 미리 만듭니다.
+        """
+        with file_lock(self.store_dir):
+            self.schema, self._key_cache = self._load_schema(), {}
+            source = self.schema["source"]
+            state, chunks = iter_responses_since(csv_path, source["generation"], source["offset"])
+            if state["full"] and (self.n_rows or state["generation"] is None):
+                self._reset()
+            if survey_schema is not None and not self.n_rows and not self.tasks:
+                self.seed(survey_schema)
+            if os.path.isdir(self.store_dir):
+                self._remove_stale_data(); self._truncate_tail()
+            # CHUNK_ROWS 행씩 변환·기록하므로 CSV 크기와 무관하게 메모리 사용량이 일정합니다.
+            added = sum(self.append_rows(df) for df in chunks if len(df))
+            self.schema["source"] = {"generation": state["generation"], "offset": state["offset"]}
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._save_schema()
+            self._remove_stale_data()
+            return added
+
+def delete_store(csv_path):
+    store_dir = store_dir_for(csv_path)
+    if os.path.isdir(store_dir): shutil.rmtree(store_dir)
+    if os.path.exists(store_dir + ".lock"): os.remove(store_dir + ".lock")
+
+def open_store(csv_path, sync=True):
+    """CSV에 대응하는 저장소를 열고, 필요하면 CSV에서 추가된 행을 먼저 반영합니다."""
+    store = ResponseStore(store_dir_for(csv_path))
+    if sync and os.path.exists(csv_path):
+        store.sync_from_csv(csv_path, load_project_schema(csv_path))
+    return store
+
+# ==============================================================================
+# [실행] 기존 CSV 일괄 변환: python response_store.py [파일 ...]
+# ==============================================================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="survey_data의 CSV 응답을 이진 저장소로 변환합니다.")
+    parser.add_argument("files", nargs="*", help="변환할 CSV (기본값: survey_data/*.csv 전체)")
+    args = parser.parse_args()
+    files = args.files or sorted(os.path.join(DATA_FOLDER, f) for f in os.listdir(DATA_FOLDER) if f.endswith(".csv"))
+    for path in files:
+        store = open_store(path)
+        print(f"{path} → {store.store_dir} ({store.n_rows}명, 비교쌍 {store.schema['n_cols']}개)")
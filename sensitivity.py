@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from ahp_analysis import report_labels
+
+# ==============================================================================
+# [설정] 민감도 분석 (대항목 가중치를 움직였을 때 종합 순위 변화)
+# ==============================================================================
+SWEEP_POINTS = 201  # 0 ~ 1 구간의 격자 점 수 (0.005 간격)
+
+# ==============================================================================
+# [함수] 리포트 → 선형 모형
+# ==============================================================================
+def report_model(report_df):
+    """
+    리포트에서 민감도 계산에 필요한 값만 뽑습니다. 반환값: (대항목 목록, 대항목 가중치 배열, 소속 행렬 S, 항목 이름)
+    S[c, r]는 행 r이 대항목 c에 속하면 소항목 가중치(소항목이 없으면 1), 아니면 0이므로 종합 가중치 = 대항목 가중치 @ S 입니다.
+    """
+    mains = report_df["대항목명"].where(report_df["대항목명"] != "").ffill()
+    main_w = report_df["대항목 가중치"].ffill().to_numpy(dtype=float)
+    criteria = list(dict.fromkeys(mains))
+    col = {c: k for k, c in enumerate(criteria)}
+    rows = np.array([col[m] for m in mains])
+    weights = np.zeros(len(criteria))
+    weights[rows] = main_w
+    shares = report_df["소항목 가중치"].fillna(1.0).to_numpy(dtype=float)
+    S = np.zeros((len(criteria), len(report_df)))
+    S[rows, np.arange(len(report_df))] = shares
+    return criteria, weights, S, report_labels(report_df)
+
+def swept_weights(weights, k, values):
+    """
+    대항목 k의 가중치를 values로 바꾸고 나머지는 원래 비율대로 합이 1이 되게 맞춘 가중치 행렬 (len(values) × 대항목 수).
+    """
+    values = np.asarray(values, dtype=float)
+    rest = 1.0 - weights[k]
+    scale = (1.0 - values)[:, None] / rest if rest > 0 else np.zeros((len(values), 1))
+    W = weights[None, :] * scale
+    W[:, k] = values
+    return W
+
+# ==============================================================================
+# [함수] 전체 격자 계산 (행렬 곱 한 번)
+# ==============================================================================
+def sensitivity_sweep(report_df, points=SWEEP_POINTS):
+    """
+    모든 대항목의 가중치를 0 ~ 1 격자로 움직일 때의 종합 가중치를 한꺼번에 구합니다.
+    대항목별 가중치 행렬을 세로로 쌓아 소속 행렬 S와 한 번 곱하므로 응답자 계산을 다시 하지 않습니다.
+    반환값: {"criteria", "weights", "labels", "grid", "total"(대항목 수 × 격자 × 항목 수)} — 대항목이 하나뿐이면 None.
+    """
+    criteria, weights, S, labels = report_model(report_df)
+    if len(criteria) < 2: return None
+    grid = np.linspace(0.0, 1.0, points)
+    W = np.concatenate([swept_weights(weights, k, grid) for k in range(len(criteria))])
+    total = (W @ S).reshape(len(criteria), points, S.shape[1])
+    return {"criteria": criteria, "weights": weights, "labels": labels, "grid": grid, "total": total}
+
+def ranking_at(report_df, criterion, value):
+    """대항목 하나의 가중치를 value로 바꿨을 때의 종합 가중치와 순위 표 (슬라이더용, 종합 가중치 내림차순)."""
+    criteria, weights, S, labels = report_model(report_df)
+    total = swept_weights(weights, criteria.index(criterion), [value])[0] @ S
+    df = pd.DataFrame({"항목": labels, "원래 종합 가중치": report_df["종합 가중치"].to_numpy(), "종합 가중치": total})
+    df["원래 순위"] = report_df["순위"].to_numpy()
+    df["순위"] = df["종합 가중치"].rank(ascending=False, method="min").astype(int)
+    return df.sort_values(["순위", "원래 순위"], kind="stable").reset_index(drop=True)
+
+# ==============================================================================
+# [함수] 순위 역전 지점 (정확한 해)
+# ==============================================================================
+def crossover_points(report_df):
+    """
+    대항목 가중치 t에 대해 각 항목의 종합 가중치는 a + b·t 꼴의 직선이므로, 두 항목의 순위가 바뀌는 t를 직접 풉니다.
+    모든 항목 쌍을 한꺼번에 계산하며, 모두 0이 되는 양 끝(t = 0, 1)은 제외합니다.
+    반환값: (교차점 DataFrame[대항목, 역전 가중치, 올라가는 항목, 내려가는 항목], 임계값 DataFrame)
+    임계값은 대항목별로 순위가 그대로 유지되는 가중치 구간 [하한, 상한]과 그 경계에서 처음 바뀌는 항목 쌍입니다.
+    대항목이 하나뿐이면 (None, None).
+    """
+    criteria, weights, S, labels = report_model(report_df)
+    if len(criteria) < 2: return None, None
+    n = S.shape[1]
+    i, j = np.triu_indices(n, 1)
+    cross_rows, limit_rows = [], []
+    for k, c in enumerate(criteria):
+        at0, at1 = swept_weights(weights, k, [0.0, 1.0]) @ S
+        a, b = at0, at1 - at0
+        db = b[i] - b[j]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (a[j] - a[i]) / db
+        hit = (db != 0) & (t > 1e-12) & (t < 1 - 1e-12)
+        # 기울기가 큰 쪽이 교차점 이후 위로 올라갑니다.
+        t, up, down = t[hit], np.where(db > 0, i, j)[hit], np.where(db > 0, j, i)[hit]
+        for tt, u, d in sorted(zip(t, up, down)):
+            cross_rows.append({"대항목": c, "역전 가중치": tt, "올라가는 항목": labels[u], "내려가는 항목": labels[d]})
+
+        below, above = t < weights[k], t > weights[k]
+        lo = int(np.argmax(np.where(below, t, -np.inf))) if below.any() else None
+        hi = int(np.argmin(np.where(above, t, np.inf))) if above.any() else None
+        limit_rows.append({
+            "대항목": c, "현재 가중치": weights[k],
+            "순위 유지 하한": t[lo] if lo is not None else 0.0,
+            "순위 유지 상한": t[hi] if hi is not None else 1.0,
+            "하한에서 역전": f"{labels[down[lo]]} ▲ / {labels[up[lo]]} ▼" if lo is not None else "",
+            "상한에서 역전": f"{labels[up[hi]]} ▲ / {labels[down[hi]]} ▼" if hi is not None else "",
+        })
+    crossings = pd.DataFrame(cross_rows, columns=["대항목", "역전 가중치", "올라가는 항목", "내려가는 항목"])
+    return crossings, pd.DataFrame(limit_rows)
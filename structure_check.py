@@ -0,0 +1,79 @@
+import re
+from itertools import combinations
+
+# ==============================================================================
+# [설정] 로컬 구조 점검 기준
+# ==============================================================================
+MAX_ITEMS = 7            # 8개 이상이면 '항목 과다' (쌍대비교 수 n(n-1)/2가 급격히 늘어남)
+SIMILARITY_LIMIT = 0.8   # 글자 2-gram 유사도가 이 값 이상이면 거의 같은 항목으로 봅니다.
+
+# ==============================================================================
+# [함수] 문자 n-gram 유사도
+# ==============================================================================
+def normalize_label(label):
+    """대소문자·공백·문장부호 차이를 없앤 비교용 문자열."""
+    return re.sub(r"[\W_]+", "", str(label)).casefold()
+
+def char_ngrams(text, n=2):
+    text = normalize_label(text)
+    if len(text) < n: return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def similarity(a, b, n=2):
+    """두 항목 이름의 문자 n-gram Dice 계수 (0~1)."""
+    ga, gb = char_ngrams(a, n), char_ngrams(b, n)
+    if not ga or not gb: return 0.0
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+# ==============================================================================
+# [함수] 그룹 점검
+# ==============================================================================
+def check_group(goal, parent, children, max_items=MAX_ITEMS, similarity_limit=SIMILARITY_LIMIT):
+    """
+    API 호출 없이 그룹 하나의 구조를 점검합니다. 반환값: [{"level", "code", "message"}]
+    level이 "error"면 쌍대비교가 성립하지 않아 AI 진단 결과가 이미 정해진 경우이고, "warning"은 참고 사항입니다.
+    """
+    labels = [str(c).strip() for c in children if str(c).strip()]
+    issues = []
+    if not labels:
+        return [{"level": "error", "code": "empty", "message": "하위 항목 없음"}]
+    if len(labels) == 1:
+        issues.append({"level": "error", "code": "single",
+                       "message": f"항목이 '{labels[0]}' 하나뿐이라 쌍대비교를 할 수 없습니다"})
+
+    seen = {}
+    for label in labels:
+        key = normalize_label(label)
+        if key in seen:
+            issues.append({"level": "error", "code": "duplicate", "message": f"'{seen[key]}'와(과) '{label}'이(가) 중복입니다"})
+        else:
+            seen[key] = label
+    unique = list(seen.values())
+    for a, b in combinations(unique, 2):
+        score = similarity(a, b)
+        if score >= similarity_limit:
+            issues.append({"level": "warning", "code": "similar",
+                           "message": f"'{a}'와(과) '{b}'이(가) 거의 같습니다 (유사도 {score:.2f})"})
+
+    if parent != goal:
+        for label in unique:
+            if normalize_label(label) == normalize_label(parent) or similarity(label, parent) >= similarity_limit:
+                issues.append({"level": "warning", "code": "parent",
+                               "message": f"'{label}'이(가) 상위 기준 '{parent}'을(를) 반복합니다"})
+
+    if len(labels) > max_items:
+        issues.append({"level": "warning", "code": "size",
+                       "message": f"항목 과다 ({len(labels)}개, 비교 {len(labels) * (len(labels) - 1) // 2}회)"})
+    return issues
+
+def local_result(issues):
+    """오류 수준 문제가 있으면 API 대신 쓸 진단 결과를, 없으면 None을 돌려줍니다."""
+    errors = [i for i in issues if i["level"] == "error"]
+    if not errors: return None
+    if errors[0]["code"] == "empty":
+        return {"grade": "정보없음", "summary": "하위 항목 없음", "suggestion": "하위 항목을 2개 이상 입력하세요.",
+                "example": "", "detail": "로컬 점검 결과입니다 (API 호출 없음).", "local": True}
+    detail = "\n".join(f"- {i['message']}" for i in issues)
+    return {"grade": "부적합", "summary": errors[0]["message"],
+            "suggestion": "중복을 정리하고 서로 구별되는 항목을 2개 이상 두세요.", "example": "",
+            "detail": f"로컬 점검 결과입니다 (API 호출 없음).\n{detail}", "local": True}
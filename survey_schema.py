@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+from itertools import permutations
+
+# ==============================================================================
+# [설정] 설문 설정 (survey_config/<id>.json) 과 과제 이름 규칙
+# ==============================================================================
+CONFIG_DIR = "survey_config"
+MAIN_TASK = "📂 1. 평가 기준 중요도 비교"
+REDUCED_MIN_ITEMS = 5  # 질문 축소 모드에서 이 개수 이상인 그룹만 2n-3문항으로 줄입니다.
+
+def sub_task_name(category):
+    return f"📂 2. [{category}] 세부 항목 평가"
+
+def answer_key(task_name, a, b):
+    """Raw_Data의 응답 키 "[과제명] A vs B"."""
+    return f"[{task_name}] {a} vs {b}"
+
+def project_stem(survey_data):
+    """설정이 가리키는 응답 파일 이름(확장자 제외). survey_store.project_csv_path와 같은 규칙입니다."""
+    return f"{survey_data.get('secret_key', 'public')}_{survey_data['goal'].replace(' ', '_')}"
+
+def build_tasks(survey_data):
+    tasks = []
+    if len(survey_data["main_criteria"]) > 1:
+        tasks.append({"name": MAIN_TASK, "items": survey_data["main_criteria"]})
+    for cat, items in survey_data["sub_criteria"].items():
+        if len(items) > 1:
+            tasks.append({"name": sub_task_name(cat), "items": items})
+    if survey_data.get("pair_mode") == "reduced":
+        for task in tasks:
+            if len(task["items"]) >= REDUCED_MIN_ITEMS: task["reduced"] = True
+    return tasks
+
+# ==============================================================================
+# [클래스] 프로젝트 스키마 색인
+# ==============================================================================
+class SurveySchema:
+    """
+    설문 설정의 계층(목표 → 기준 → 세부 항목)에서 한 번 만드는 색인입니다.
+    key_index는 응답 키 → (과제 번호, i, j) 행렬 좌표이고, sub_tasks는 기준 → 세부 항목 과제 이름이므로
+    응답 해석과 리포트 구성에 문자열 분해나 이름 유사도 비교가 필요 없습니다.
+    """
+
+    def __init__(self, survey_data):
+        self.tasks = build_tasks(survey_data)
+        self.task_ids = {t["name"]: k for k, t in enumerate(self.tasks)}
+        self.main_criteria = list(survey_data["main_criteria"])
+        self.main_task = MAIN_TASK if MAIN_TASK in self.task_ids else None
+        self.sub_tasks = {cat: sub_task_name(cat) for cat in survey_data["sub_criteria"]
+                          if sub_task_name(cat) in self.task_ids}
+        self.key_index = {}
+        for t_idx, task in enumerate(self.tasks):
+            items = task["items"]
+            for i, j in permutations(range(len(items)), 2):
+                self.key_index[answer_key(task["name"], items[i], items[j])] = (t_idx, i, j)
+
+# ==============================================================================
+# [함수] 응답 파일 → 설정 찾기 (설정 폴더가 바뀔 때만 다시 훑음)
+# ==============================================================================
+_index_lock = threading.Lock()
+_index = {"mtime_ns": None, "projects": {}}
+_schemas = {}
+
+def _project_index(config_dir):
+    try:
+        mtime_ns = os.stat(config_dir).st_mtime_ns
+    except OSError:
+        return {}
+    if _index["mtime_ns"] == (config_dir, mtime_ns):
+        return _index["projects"]
+    projects = {}
+    for name in os.listdir(config_dir):
+        if not name.endswith(".json"): continue
+        path = os.path.join(config_dir, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stem = project_stem(json.load(f))
+            mtime = os.stat(path).st_mtime_ns
+        except (OSError, ValueError, KeyError, AttributeError):
+            continue
+        # 같은 프로젝트로 링크를 여러 번 만들었으면 가장 최근 설정을 씁니다.
+        if stem not in projects or projects[stem][0] < mtime:
+            projects[stem] = (mtime, path)
+    _index.update(mtime_ns=(config_dir, mtime_ns), projects=projects)
+    return projects
+
+def load_project_schema(csv_path, config_dir=CONFIG_DIR):
+    """응답 CSV에 대응하는 설문 설정의 SurveySchema. 설정이 없으면(레거시·복구 전용 프로젝트) None."""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    with _index_lock:
+        found = _project_index(config_dir).get(stem)
+        if found is None: return None
+        if _schemas.get(found[1], (None,))[0] != found[0]:
+            with open(found[1], "r", encoding="utf-8") as f:
+                _schemas[found[1]] = (found[0], SurveySchema(json.load(f)))
+        return _schemas[found[1]][1]
@@ -0,0 +1,278 @@
+import codecs
+import csv
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# ==============================================================================
+# [설정] 응답 저장소 (survey_data/<key>_<goal>.csv)
+# ==============================================================================
+DATA_FOLDER = "survey_data"
+CSV_COLUMNS = ["Time", "Respondent", "Raw_Data"]
+CHUNK_ROWS = 5000    # 읽기·정리는 이 행 수 단위로 처리해 파일 크기와 무관하게 메모리 사용량을 일정하게 유지합니다.
+
+def project_csv_path(secret_key, goal_clean):
+    return os.path.join(DATA_FOLDER, f"{secret_key}_{goal_clean}.csv")
+
+def _meta_path(file_path): return file_path + ".meta.json"
+def _lock_path(file_path): return file_path + ".lock"
+
+# ==============================================================================
+# [함수] 프로세스 간 파일 잠금
+# ==============================================================================
+@contextmanager
+def file_lock(file_path, timeout=30.0):
+    """<file>.lock 에 배타 잠금을 걸어, 여러 프로세스/스레드의 동시 쓰기를 직렬화합니다."""
+    with open(_lock_path(file_path), "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fh.seek(0)
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline: raise TimeoutError(f"잠금 대기 시간 초과: {file_path}")
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+# ==============================================================================
+# [함수] 메타 정보 (마지막으로 정상 기록된 파일 크기, 행 수, 열, 세대 토큰)
+# ==============================================================================
+def _load_meta(file_path):
+    try:
+        with open(_meta_path(file_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_meta(file_path, meta):
+    tmp = _meta_path(file_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(file_path))
+
+def _new_generation():
+    """파일이 새로 쓰일 때마다 바뀌는 토큰. 이전 바이트 오프셋이 더 이상 유효하지 않음을 알립니다."""
+    return os.urandom(8).hex()
+
+def _encode_rows(rows, columns, header=False):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if header: writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+    return buf.getvalue().encode("utf-8")
+
+# ==============================================================================
+# [함수] 읽기 & 정리(compaction)
+# ==============================================================================
+def detect_encoding(file_path, block_size=1 << 20):
+    """파일을 블록 단위로 훑어 UTF-8(BOM 포함) 여부를 확인합니다. UTF-8이 아니면 CP949(엑셀 저장 파일)로 봅니다."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                decoder.decode(block)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp949"
+    return "utf-8-sig"
+
+def read_csv_any(file_path, **kwargs):
+    """인코딩을 먼저 판별한 뒤 한 번만 읽습니다. chunksize를 주면 청크 iterator를 돌려줍니다."""
+    return pd.read_csv(file_path, encoding=detect_encoding(file_path), **kwargs)
+
+def _same_prefix(path_a, path_b, n, block_size=1 << 20):
+    """두 파일의 처음 n바이트가 같은지 블록 단위로 비교합니다."""
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while n > 0:
+            block = a.read(min(block_size, n))
+            if not block or block != b.read(len(block)): return False
+            n -= len(block)
+    return True
+
+def _rewrite_locked(file_path, columns, prev=None):
+    """
+    CHUNK_ROWS 행씩 읽어 UTF-8 임시 파일에 다시 쓴 뒤 교체합니다. 행은 하나도 버리지 않습니다
+    (Time이 분 단위라 같은 이름·같은 응답이 같은 분에 두 번 제출될 수 있음).
+    결과가 원래 파일과 같으면 교체하지 않고, 이전 메타(prev)가 가리키던 부분이 그대로면 세대 토큰을 유지해
+    읽는 쪽이 가진 오프셋이 계속 유효하도록 합니다.
+    """
+    extra = list(columns or [])
+    try:
+        chunks = read_csv_any(file_path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS)
+    except pd.errors.EmptyDataError:
+        chunks = []
+    ordered, size, rows = None, 0, 0
+    tmp = file_path + ".tmp"
+    with open(tmp, "wb") as f:
+        for df in chunks:
+            if ordered is None:
+                ordered = CSV_COLUMNS + [c for c in df.columns if c not in CSV_COLUMNS]
+                ordered += [c for c in dict.fromkeys(extra) if c not in ordered]
+                size += f.write(_encode_rows([], ordered, header=True))
+            for c in ordered:
+                if c not in df.columns: df[c] = ""
+            size += f.write(_encode_rows((dict(zip(ordered, v)) for v in df[ordered].itertuples(index=False, name=None)),
+                                         ordered))
+            rows += len(df)
+        if ordered is None:
+            ordered = CSV_COLUMNS + [c for c in dict.fromkeys(extra) if c not in CSV_COLUMNS]
+            size += f.write(_encode_rows([], ordered, header=True))
+        f.flush(); os.fsync(f.fileno())
+
+    generation = _new_generation()
+    if prev and prev.get("generation") and 0 < prev.get("size", 0) <= size and _same_prefix(tmp, file_path, prev["size"]):
+        generation = prev["generation"]
+    if size == os.path.getsize(file_path) and _same_prefix(tmp, file_path, size):
+        os.remove(tmp)
+    else:
+        os.replace(tmp, file_path)
+    meta = {"version": 1, "size": size, "rows": rows, "columns": ordered, "generation": generation}
+    _save_meta(file_path, meta)
+    return meta
+
+def _compact_locked(file_path, columns=None):
+    meta = _load_meta(file_path)
+    try:
+        return _rewrite_locked(file_path, columns, meta)
+    except pd.errors.ParserError:
+        # 기록 도중 중단된 마지막 행(torn write)은 마지막 정상 크기로 잘라낸 뒤 다시 읽습니다.
+        if not meta or meta["size"] >= os.path.getsize(file_path): raise
+        with open(file_path, "r+b") as f: f.truncate(meta["size"])
+        return _rewrite_locked(file_path, columns, meta)
+
+def compact_csv(file_path, columns=None):
+    """
+    파일을 UTF-8로 다시 쓰고(레거시 CP949 변환), 중단된 마지막 행을 정리합니다.
+    columns가 주어지면 누락된 열을 추가합니다.
+    """
+    with file_lock(file_path):
+        return _compact_locked(file_path, columns)
+
+def _needs_compaction(file_path, meta):
+    """메타가 없거나(레거시 파일) 파일 크기가 마지막 정상 기록과 다를 때만(외부 수정·중단된 쓰기) 정리합니다."""
+    return meta is None or meta.get("size") != os.path.getsize(file_path)
+
+class _BoundedReader(io.RawIOBase):
+    """열린 파일에서 최대 limit 바이트까지만 읽습니다 (잠금을 푼 뒤 추가된 꼬리는 다음 호출에서 읽음)."""
+
+    def __init__(self, fh, limit):
+        self.fh, self.remaining = fh, limit
+
+    def readable(self): return True
+
+    def readinto(self, buf):
+        if self.remaining <= 0: return 0
+        n = self.fh.readinto(memoryview(buf)[:min(len(buf), self.remaining)])
+        self.remaining -= n
+        return n
+
+    def close(self):
+        self.fh.close(); super().close()
+
+def _iter_chunks(fh, limit, names, chunksize, read_kwargs):
+    with io.TextIOWrapper(io.BufferedReader(_BoundedReader(fh, limit)), encoding="utf-8-sig", newline="") as text:
+        try:
+            reader = pd.read_csv(text, chunksize=chunksize, **read_kwargs,
+                                 **({} if names is None else {"header": None, "names": names}))
+        except pd.errors.EmptyDataError:
+            return
+        with reader:
+            yield from reader
+
+def iter_responses_since(file_path, generation=None, offset=0, chunksize=CHUNK_ROWS, **read_kwargs):
+    """
+    offset 바이트 이후에 추가된 행만 청크 단위로 읽습니다. 반환값: (상태 dict, DataFrame 청크 iterator)
+    상태의 generation이 호출자가 가진 값과 다르면 파일이 다시 쓰인 것이므로 처음부터 읽으며,
+    이때 상태의 "full"이 True가 됩니다. 메타 정보가 파일과 맞지 않으면 먼저 정리합니다.
+    메타 정보와 파일 핸들은 잠금 안에서 확보하므로, 읽는 도중 파일이 정리(교체)되어도 같은 스냅샷을 끝까지 읽습니다.
+    read_kwargs(dtype 등)는 pandas.read_csv에 그대로 넘깁니다.
+    """
+    with file_lock(file_path):
+        meta = _load_meta(file_path)
+        if _needs_compaction(file_path, meta):
+            try: meta = _compact_locked(file_path)
+            except Exception: meta = None
+        if meta is None:
+            state = {"generation": None, "offset": 0, "full": True, "columns": None}
+            return state, read_csv_any(file_path, chunksize=chunksize, **read_kwargs)
+
+        full = generation != meta.get("generation") or offset > meta["size"] or offset <= 0
+        start = 0 if full else offset
+        fh = open(file_path, "rb")
+        fh.seek(start)
+    state = {"generation": meta.get("generation"), "offset": meta["size"], "full": full, "columns": meta["columns"]}
+    return state, _iter_chunks(fh, meta["size"] - start, None if full else meta["columns"], chunksize, read_kwargs)
+
+def delete_project(file_path):
+    for p in (file_path, _meta_path(file_path), _lock_path(file_path)):
+        if os.path.exists(p): os.remove(p)
+
+# ==============================================================================
+# [함수] O(1) 추가 기록
+# ==============================================================================
+def append_response(file_path, row):
+    """
+    응답 한 건을 파일 끝에 추가합니다. 파일 전체를 읽거나 다시 쓰지 않으므로
+    응답 수와 무관하게 비용이 일정하며, 잠금으로 동시 제출 시에도 행이 유실되지 않습니다.
+    """
+    append_responses(file_path, [row])
+
+def append_responses(file_path, rows):
+    """여러 행을 한 번의 잠금·쓰기로 추가합니다 (클라우드 복구 등)."""
+    rows = list(rows)
+    if not rows: return
+    keys = list(dict.fromkeys(c for row in rows for c in row))
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with file_lock(file_path):
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            columns = CSV_COLUMNS + [c for c in keys if c not in CSV_COLUMNS]
+            data = _encode_rows(rows, columns, header=True)
+            with open(file_path, "wb") as f:
+                f.write(data); f.flush(); os.fsync(f.fileno())
+            _save_meta(file_path, {"version": 1, "size": len(data), "rows": len(rows), "columns": columns,
+                                   "generation": _new_generation()})
+            return
+
+        meta = _load_meta(file_path)
+        # 메타가 없거나(레거시 파일), 외부에서 수정되었거나, 새 열이 필요하면 한 번 정리합니다.
+        if meta is None or meta.get("size") != os.path.getsize(file_path) \
+                or any(c not in meta.get("columns", []) for c in keys):
+            meta = _compact_locked(file_path, columns=keys)
+
+        data = _encode_rows(rows, meta["columns"])
+        fd = os.open(file_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        meta["size"] += len(data)
+        meta["rows"] += len(rows)
+        _save_meta(file_path, meta)